@@ -0,0 +1,225 @@
+import io
+import os
+import queue
+import logging
+import threading
+import time
+import zipfile
+import zlib
+import jobs
+from pdf_extract import iter_pdf_pages, iter_chunks
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Documents parsed ahead of the embedding stage (and embedded ahead of the write stage)
+PIPELINE_QUEUE_SIZE = int(os.getenv("INGEST_PIPELINE_QUEUE_SIZE", "2"))
+MAX_BULK_DOCUMENTS = int(os.getenv("MAX_BULK_DOCUMENTS", "200"))
+MAX_BULK_UPLOAD_BYTES = int(os.getenv("MAX_BULK_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+
+# Marks the end of the stream between pipeline stages
+_DONE = object()
+# How often a stage blocked on a queue checks whether the job was stopped
+QUEUE_POLL_SECONDS = 0.5
+
+def _put(q, item, stop):
+    """Put item on q, waiting for room; False if stop was set first."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=QUEUE_POLL_SECONDS)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def _get(q, stop):
+    """Next item from q, or _DONE once stop is set."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=QUEUE_POLL_SECONDS)
+        except queue.Empty:
+            pass
+    return _DONE
+
+def _drain(q):
+    while True:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            return
+
+def expand_uploads(files, max_documents=MAX_BULK_DOCUMENTS, max_bytes=MAX_BULK_UPLOAD_BYTES):
+    """Turn uploaded PDFs and ZIPs of PDFs into (name, bytes) documents plus a list of rejected names."""
+    documents = []
+    rejected = []
+    total_bytes = 0
+
+    def add(name, data):
+        nonlocal total_bytes
+        if len(documents) >= max_documents:
+            rejected.append({"name": name, "error": f"More than {max_documents} documents in one upload"})
+        elif total_bytes + len(data) > max_bytes:
+            rejected.append({"name": name, "error": "Upload size limit exceeded"})
+        else:
+            total_bytes += len(data)
+            documents.append((name, data))
+
+    for file in files:
+        name = file.filename or ""
+        lower_name = name.lower()
+        if lower_name.endswith('.pdf'):
+            add(name, file.read())
+        elif lower_name.endswith('.zip'):
+            try:
+                with zipfile.ZipFile(io.BytesIO(file.read())) as archive:
+                    for member in archive.infolist():
+                        member_name = member.filename
+                        if member.is_dir() or member_name.startswith('__MACOSX/') or not member_name.lower().endswith('.pdf'):
+                            continue
+                        # Check the declared size before inflating anything
+                        if total_bytes + member.file_size > max_bytes:
+                            rejected.append({"name": f"{name}/{member_name}", "error": "Upload size limit exceeded"})
+                            continue
+                        try:
+                            data = archive.read(member)
+                        except (RuntimeError, NotImplementedError, zipfile.BadZipFile, zlib.error, EOFError) as e:
+                            # Encrypted member, unsupported compression method or corrupt data
+                            rejected.append({"name": f"{name}/{member_name}", "error": f"Unreadable ZIP member: {str(e)}"})
+                            continue
+                        add(f"{name}/{member_name}", data)
+            except zipfile.BadZipFile:
+                rejected.append({"name": name, "error": "Invalid ZIP file"})
+            except (RuntimeError, NotImplementedError, zlib.error, EOFError) as e:
+                # Encrypted archives and unsupported compression fail on open or on the first member
+                rejected.append({"name": name, "error": f"Unreadable ZIP file: {str(e)}"})
+        else:
+            rejected.append({"name": name, "error": "Unsupported file type. Upload PDF or ZIP files"})
+    return documents, rejected
+
+def run_ingestion_job(job_store, job_id, documents, collection, on_complete=None):
+    """Extract, embed and write documents as three overlapping stages joined by bounded queues."""
+    start = time.time()
+    try:
+        import process_admin_pdf as pipeline
+    except Exception as e:
+        logger.error(f"Ingestion job {job_id} could not start: {str(e)}")
+        job_store.update(job_id, status=jobs.FAILED, error=f"Ingestion unavailable: {str(e)}")
+        return
+
+    job_store.update(job_id, status=jobs.RUNNING)
+    extracted = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    embedded = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    # Set when the job ends, so stages blocked on a full or empty queue give up
+    stop = threading.Event()
+    failures = []
+    stage_errors = []
+
+    def abort(stage, e):
+        # An error outside the per-document handling ends the whole job
+        logger.error(f"Job {job_id}: {stage} stage failed: {str(e)}", exc_info=True)
+        stage_errors.append(f"{stage} stage failed: {str(e)}")
+        stop.set()
+
+    def fail(index, stage, e):
+        name = documents[index][0]
+        logger.error(f"Job {job_id}: {stage} failed for {name}: {str(e)}")
+        failures.append(name)
+        job_store.update_document(job_id, index, status=jobs.FAILED, error=f"{stage} failed: {str(e)}")
+
+    def extract_stage():
+        try:
+            for index, (name, data) in enumerate(documents):
+                if stop.is_set():
+                    return
+                job_store.update_document(job_id, index, status="extracting")
+                try:
+                    # Pages stream straight into chunks; no whole-document string is built
+                    chunks = list(iter_chunks(iter_pdf_pages(data)))
+                    if not chunks:
+                        raise ValueError("No text extracted from PDF")
+                except Exception as e:
+                    fail(index, "extraction", e)
+                    continue
+                job_store.update_document(job_id, index, status="extracted", chunks=len(chunks))
+                if not _put(extracted, (index, chunks), stop):
+                    return
+        except Exception as e:
+            abort("extraction", e)
+        finally:
+            _put(extracted, _DONE, stop)
+
+    def embed_stage():
+        try:
+            while True:
+                item = _get(extracted, stop)
+                if item is _DONE:
+                    return
+                index, chunks = item
+                job_store.update_document(job_id, index, status="embedding")
+                try:
+                    plan = pipeline.embed_plan(pipeline.plan_sync(chunks, collection, documents[index][0]))
+                except Exception as e:
+                    fail(index, "embedding", e)
+                    continue
+                job_store.update_document(job_id, index, status="embedded")
+                if not _put(embedded, (index, plan), stop):
+                    return
+        except Exception as e:
+            abort("embedding", e)
+        finally:
+            _put(embedded, _DONE, stop)
+
+    stages = [
+        threading.Thread(target=extract_stage, name=f"ingest-extract-{job_id[:8]}", daemon=True),
+        threading.Thread(target=embed_stage, name=f"ingest-embed-{job_id[:8]}", daemon=True)
+    ]
+    for stage in stages:
+        stage.start()
+
+    # The write stage runs on this thread
+    totals = {"added": 0, "removed": 0, "unchanged": 0, "embedded_chunks": 0, "embed_seconds": 0.0}
+    try:
+        while True:
+            item = _get(embedded, stop)
+            if item is _DONE:
+                break
+            index, plan = item
+            job_store.update_document(job_id, index, status="writing")
+            try:
+                stats = pipeline.apply_plan(plan)
+            except Exception as e:
+                fail(index, "write", e)
+                continue
+            for key in totals:
+                totals[key] += stats[key]
+            job_store.update_document(job_id, index, status=jobs.COMPLETED, **stats)
+        for stage in stages:
+            stage.join()
+        if stage_errors:
+            raise RuntimeError("; ".join(stage_errors))
+    except Exception as e:
+        logger.error(f"Ingestion job {job_id} failed: {str(e)}", exc_info=True)
+        job_store.update(job_id, status=jobs.FAILED, error=str(e))
+        return
+    finally:
+        # Release stages still blocked on a queue (after a failure) and drop what they queued
+        stop.set()
+        _drain(extracted)
+        _drain(embedded)
+
+    elapsed = time.time() - start
+    totals.update({
+        "documents": len(documents),
+        "failed_documents": len(failures),
+        "collection_count": pipeline.count_objects_in_collection(collection),
+        "embed_seconds": round(totals["embed_seconds"], 3),
+        # Rate of the embedding stage alone, which overlaps extraction and writes
+        "chunks_per_second": round(totals["embedded_chunks"] / totals["embed_seconds"], 1) if totals["embed_seconds"] > 0 else 0.0,
+        "seconds": round(elapsed, 3)
+    })
+    status = jobs.COMPLETED if not failures else (jobs.FAILED if len(failures) == len(documents) else jobs.COMPLETED_WITH_ERRORS)
+    job_store.update(job_id, status=status, result=totals)
+    logger.info(f"Ingestion job {job_id} {status} in {elapsed:.2f}s: {totals}")
+    if on_complete:
+        on_complete()
@@ -1,33 +1,40 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from pymongo.errors import ConnectionFailure, DuplicateKeyError
 from dotenv import load_dotenv
-from paddleocr import PaddleOCR
-import PyPDF2
 import os
 import bcrypt
 import jwt
 from datetime import datetime, timedelta
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from bson import ObjectId
 import certifi
 import logging
 import time
-from weaviate import Client
-import weaviate.auth
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain_community.vectorstores import Weaviate
-from langchain.chains.question_answering import load_qa_chain
-from langchain.prompts import PromptTemplate
-from langchain.schema import Document
-from process_admin_pdf import process_admin_pdf
-import numpy as np
-from tensorflow.keras.preprocessing.image import load_img, img_to_array
-import google.generativeai as genai
-import re
-from tensorflow.keras.layers import TFSMLayer
+from food_classifier import get_food_classifier, CLASS_LABELS
+from inference_client import InferenceClient, RemoteFoodClassifier, RemoteOCR
+from food_knowledge import FoodKnowledgeIndex
+from vector_stores import VectorStoreRegistry, USER_PROFILE_CLASS, MEDICAL_REPORT_CLASS, TENANT_SCHEMAS, KNOWLEDGE_PROPERTIES, tenant_filter, delete_where
+from image_io import LockedOCR, read_upload, load_classifier_input, perceptual_hash
+from cache import LRUCache, SemanticAnswerCache, all_cache_stats
+import jobs
+from jobs import JobStore
+from report_extract import REPORT_EXTENSIONS, REPORT_OCR_PROCESSES, extract_report_text, get_extraction_pool
+from admin_ingest import expand_uploads, run_ingestion_job
+import readiness
+import llm_clients
+from response_format import IncrementalHtmlFormatter, format_response_to_html
+from context_builder import build_context
+import hashlib
 import json
+import socket
+import uuid
+
+# Heavy subsystems (TensorFlow, PaddleOCR, LangChain, Gemini, Weaviate) are imported and
+# initialized on background threads (see readiness.py), so the process serves /healthz
+# and the Mongo-only routes within seconds of starting.
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -44,49 +51,92 @@ logger.debug(f"GOOGLE_API_KEY loaded: {GOOGLE_API_KEY}")
 WEAVIATE_URL = os.getenv("WEAVIATE_URL")
 WEAVIATE_API_KEY = os.getenv("WEAVIATE_API_KEY")
 
+# How long a request waits for a subsystem that is still starting before answering 503
+READINESS_WAIT_SECONDS = float(os.getenv("READINESS_WAIT_SECONDS", "30"))
+
 app = Flask(__name__)
 
-# Initialize OCR globally (run once)
-ocr = PaddleOCR(use_angle_cls=True, lang='en', use_gpu=False)
+# Model inference: either through the shared inference server (INFERENCE_SOCKET)
+# or in-process, loaded once per worker
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET")
+inference_client = InferenceClient(INFERENCE_SOCKET) if INFERENCE_SOCKET else None
+ocr = None
+food_classifier = None
+
+def init_ocr():
+    global ocr
+    if inference_client:
+        ocr = RemoteOCR(inference_client)
+        inference_client.ping()
+    elif REPORT_OCR_PROCESSES > 0:
+        # Report OCR runs in the extraction pool, which loads its own engines
+        get_extraction_pool()
+    else:
+        from paddleocr import PaddleOCR
+
+        # Initialize OCR globally (run once); report job threads share it
+        ocr = LockedOCR(PaddleOCR(use_angle_cls=True, lang='en', use_gpu=False))
+
+def init_food_classifier():
+    global food_classifier
+    if inference_client:
+        food_classifier = RemoteFoodClassifier(inference_client)
+        inference_client.ping()
+        logger.info(f"Using inference server at {INFERENCE_SOCKET}")
+    else:
+        # Load and warm up the food classifier globally (run once)
+        food_classifier = get_food_classifier()
+
+MAX_BATCH_IMAGES = int(os.getenv("MAX_BATCH_IMAGES", "10"))
+
+# Perceptual-hash caches for repeated food images (FOOD_CACHE_DB adds an on-disk copy)
+food_prediction_cache = LRUCache("food_predictions", maxsize=int(os.getenv("FOOD_CACHE_SIZE", "1024")),
+                                 db_path=os.getenv("FOOD_CACHE_DB"))
+food_analysis_cache = LRUCache("food_analyses", maxsize=int(os.getenv("FOOD_ANALYSIS_CACHE_SIZE", "256")),
+                               db_path=os.getenv("FOOD_CACHE_DB"))
 
 # CORS configuration
 CORS_ORIGIN = os.getenv("CORS_ORIGIN", "http://localhost:3000")
 CORS(app, resources={r"/api/*": {"origins": CORS_ORIGIN}}, supports_credentials=True)
 
-# MongoDB connection with retry
+# MongoDB connection (the client connects lazily; the ping with retry runs in the background)
 mongo_uri = os.getenv("MONGO_URI")
 max_retries = 3
 retry_delay = 5  # seconds
-client = None
+try:
+    client = MongoClient(
+        mongo_uri,
+        serverSelectionTimeoutMS=30000,
+        connectTimeoutMS=30000,
+        socketTimeoutMS=30000,
+        tls=True,
+        tlsCAFile=certifi.where(),
+        tlsAllowInvalidCertificates=False
+    )
+    db = client["medical-bot"]
+    users_collection = db["users"]
+    job_store = JobStore(db["jobs"])
+    # Processed medical reports by (user, content hash): text, chunk vectors and summary
+    reports_collection = db["medical_reports"]
+except Exception as e:
+    logger.error(f"Error setting up MongoDB connection: %s", e)
+    exit(1)
 
-for attempt in range(max_retries):
-    try:
-        logger.debug("Attempting to connect to MongoDB (attempt %d/%d)...", attempt + 1, max_retries)
-        client = MongoClient(
-            mongo_uri,
-            serverSelectionTimeoutMS=30000,
-            connectTimeoutMS=30000,
-            socketTimeoutMS=30000,
-            tls=True,
-            tlsCAFile=certifi.where(),
-            tlsAllowInvalidCertificates=False
-        )
-        client.admin.command('ping')
-        db = client["medical-bot"]
-        users_collection = db["users"]
-        logger.info("Connected to MongoDB successfully!")
-        break
-    except ConnectionFailure as e:
-        logger.error(f"Failed to connect to MongoDB (attempt %d/%d): %s", attempt + 1, max_retries, e)
-        if attempt < max_retries - 1:
-            logger.info(f"Retrying in {retry_delay} seconds...")
-            time.sleep(retry_delay)
-        else:
-            logger.error("Max retries reached. Exiting...")
-            exit(1)
-    except Exception as e:
-        logger.error(f"Error setting up MongoDB connection: %s", e)
-        exit(1)
+def init_mongo():
+    for attempt in range(max_retries):
+        try:
+            logger.debug("Attempting to connect to MongoDB (attempt %d/%d)...", attempt + 1, max_retries)
+            client.admin.command('ping')
+            logger.info("Connected to MongoDB successfully!")
+            return
+        except ConnectionFailure as e:
+            logger.error(f"Failed to connect to MongoDB (attempt %d/%d): %s", attempt + 1, max_retries, e)
+            if attempt < max_retries - 1:
+                logger.info(f"Retrying in {retry_delay} seconds...")
+                time.sleep(retry_delay)
+            else:
+                logger.error("Max retries reached.")
+                raise
 
 # Secret key for JWT
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -98,42 +148,65 @@ app.config['JWT_SECRET_KEY'] = SECRET_KEY
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=1)
 
 # Initialize Weaviate Client
-try:
+weaviate_client = None
+
+# Shared vector-store handles and class-existence cache (filled in once Weaviate/embeddings are up)
+vector_stores = VectorStoreRegistry()
+
+def init_weaviate():
+    global weaviate_client
     if WEAVIATE_URL and WEAVIATE_API_KEY:
-        weaviate_client = Client(
+        from weaviate import Client
+        import weaviate.auth
+
+        new_client = Client(
             url=WEAVIATE_URL,
             auth_client_secret=weaviate.auth.AuthApiKey(api_key=WEAVIATE_API_KEY),
             timeout_config=(10, 60)  # 10s connection, 60s read
         )
-        weaviate_client.get_meta()
+        new_client.get_meta()
+        weaviate_client = new_client
+        vector_stores.client = new_client
         logger.info("Successfully connected to Weaviate Cloud")
     else:
         logger.warning("Weaviate URL or API key not provided, skipping Weaviate initialization")
-        weaviate_client = None
-except Exception as e:
-    logger.error(f"Failed to initialize Weaviate client: {str(e)}")
-    weaviate_client = None
 
 # Initialize Embedding Model
-os.environ["GOOGLE_API_KEY"] = GOOGLE_API_KEY
-embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-genai.configure(api_key=GOOGLE_API_KEY)
+embeddings = None
+
+def init_embeddings():
+    global embeddings
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    import google.generativeai as genai
+    from embedding_cache import CachedEmbeddings
+
+    os.environ["GOOGLE_API_KEY"] = GOOGLE_API_KEY
+    # Repeated texts (unchanged profiles, label queries, re-uploaded reports) are served from the cache
+    embeddings = CachedEmbeddings(GoogleGenerativeAIEmbeddings(model="models/embedding-001"), model="models/embedding-001")
+    vector_stores.embeddings = embeddings
+    genai.configure(api_key=GOOGLE_API_KEY)
+
+def init_llm():
+    # Import the chain machinery and build the shared models/chains off the request path
+    import langchain.schema  # noqa: F401
+    import langchain_community.vectorstores  # noqa: F401
+    llm_clients.build_all()
 
 # Create Weaviate schemas on startup
 def create_weaviate_schemas():
-    collections = ["Admin", "food_analyse"]
-    for collection in collections:
-        schema = {
+    shared_schemas = [
+        {
             "class": collection,
             "vectorizer": "none",
-            "properties": [
-                {"name": "text", "dataType": ["text"]}
-            ]
+            "properties": KNOWLEDGE_PROPERTIES
         }
-        if weaviate_client and not weaviate_client.schema.exists(collection):
+        for collection in ["Admin", "food_analyse"]
+    ] + TENANT_SCHEMAS
+    for schema in shared_schemas:
+        collection = schema["class"]
+        if weaviate_client and not vector_stores.class_exists(collection):
             try:
-                weaviate_client.schema.create_class(schema)
-                logger.info(f"Created Weaviate class: {collection}")
+                vector_stores.create_class(schema)
                 # Add default food data if food_analyse is newly created
                 if collection == "food_analyse" and not weaviate_client.query.aggregate(collection).with_meta_count().do().get("data", {}).get("Aggregate", {}).get(collection, [{}])[0].get("meta", {}).get("count", 0):
                     default_data = [
@@ -153,61 +226,34 @@ def create_weaviate_schemas():
         else:
             logger.info(f"Class {collection} already exists or Weaviate client is None")
 
-create_weaviate_schemas()
-
-# Function to convert structured text to HTML string
-def format_response_to_html(text):
-    if not text or not isinstance(text, str):
-        return "<p>Error: Invalid response format.</p>"
-
-    lines = text.split('\n')
-    html_lines = []
-    in_list = False
-    current_section = None
-
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-
-        if line.startswith('- **'):
-            if in_list:
-                html_lines.append('</ul>' if current_section == 'bulleted' else '</ol>')
-                in_list = False
-            section_title = line[4:line.rfind(':**')].strip() if line.endswith(':**') else line[4:].strip()
-            html_lines.append(f'<strong>{section_title}:</strong>')
-            continue
-        elif line.startswith('* - '):
-            if not in_list or current_section == 'numbered':
-                if in_list:
-                    html_lines.append('</ol>' if current_section == 'numbered' else '</ul>')
-                html_lines.append('<ul>')
-                in_list = True
-                current_section = 'bulleted'
-            item = line.replace('* - ', '').strip()
-            html_lines.append(f'<li>{item}</li>')
-        elif re.match(r'^\d+\.', line):
-            if not in_list or current_section == 'bulleted':
-                if in_list:
-                    html_lines.append('</ul>' if current_section == 'bulleted' else '</ol>')
-                html_lines.append('<ol>')
-                in_list = True
-                current_section = 'numbered'
-            item = line[line.find(' ') + 1:].strip()
-            html_lines.append(f'<li>{item}</li>')
-        else:
-            if in_list:
-                html_lines.append('</ul>' if current_section == 'bulleted' else '</ol>')
-                in_list = False
-            html_lines.append(f'<p>{line}</p>')
-
-    if in_list:
-        html_lines.append('</ul>' if current_section == 'bulleted' else '</ol>')
-
-    return ''.join(html_lines)
+# Precompute food knowledge for the fixed classifier labels
+food_knowledge_index = FoodKnowledgeIndex(
+    None, None, CLASS_LABELS,
+    min_refresh_interval=int(os.getenv("FOOD_KNOWLEDGE_REFRESH_SECONDS", "300"))
+)
+
+def init_food_knowledge():
+    food_knowledge_index.client = weaviate_client
+    food_knowledge_index.embeddings = embeddings
+    food_knowledge_index.build()
+
+# Register background initialization; started at the bottom of this module
+readiness.register("mongo", init_mongo)
+readiness.register("embeddings", init_embeddings)
+readiness.register("weaviate", init_weaviate, required=False)
+readiness.register("weaviate_schemas", create_weaviate_schemas, depends_on=["weaviate", "embeddings"], required=False)
+readiness.register("llm", init_llm)
+# TensorFlow and PaddleOCR load slowly; text and chat traffic is served before they are
+# ready and only the food and report routes wait for them
+readiness.register("food_classifier", init_food_classifier, gates_readiness=False)
+readiness.register("ocr", init_ocr, gates_readiness=False)
+readiness.register("food_knowledge", init_food_knowledge, depends_on=["weaviate_schemas"], required=False)
+
+def requires(*names):
+    return readiness.requires(*names, timeout=READINESS_WAIT_SECONDS)
 
 # QA Chain Setup for Medical Questions
-def get_conversational_chain():
+def build_conversational_chain():
     prompt_template = """
         You are a professional and friendly medical advisor. Assist users with health-related queries based on their medical history and general admin guidelines stored in Weaviate. Provide concise, structured, and user-friendly responses limited to 150-200 words.
         do not answer in more elabrate. give the answer for the question ** behave like a chatbot. **
@@ -244,14 +290,17 @@ def get_conversational_chain():
         (Generate a structured response following the guidelines.)
     """
 
-    model = ChatGoogleGenerativeAI(model="gemini-1.5-pro", temperature=0.5, google_api_key=GOOGLE_API_KEY)
+    from langchain.chains.question_answering import load_qa_chain
+    from langchain.prompts import PromptTemplate
+
     prompt = PromptTemplate(template=prompt_template, input_variables=["context", "user_history", "question"])
-    chain = load_qa_chain(model, chain_type="stuff", prompt=prompt)
-    return chain
+    return load_qa_chain(llm_clients.get_model(temperature=0.5), chain_type="stuff", prompt=prompt)
+
+def get_conversational_chain():
+    return llm_clients.get_chain("medical_qa")
 
 # General conversational response
 def get_general_response(user_message, user_history):
-    model = ChatGoogleGenerativeAI(model="gemini-1.5-pro", temperature=0.7, google_api_key=GOOGLE_API_KEY)
     if "hi" in user_message.lower() or "hello" in user_message.lower():
         return "Hello! I'm your medical assistant. How can I help you with your health today?"
     elif "name" in user_message.lower() and "?" in user_message:
@@ -261,12 +310,15 @@ def get_general_response(user_message, user_history):
         except IndexError:
             return "I couldn’t find your name in your profile. Could you please update your details?"
     else:
-        response = model.invoke(f"Respond conversationally to: '{user_message}' as a medical advisor")
+        # Only this branch needs the model
+        response = llm_clients.llm(temperature=0.7).invoke(f"Respond conversationally to: '{user_message}' as a medical advisor")
         return response.content
 
 # Food Analysis Prompt
-def analyze_food_with_health_and_knowledge(food_label, confidence, user_history, context, input_documents=None):
-    food_analysis_model = ChatGoogleGenerativeAI(model="gemini-1.5-pro", temperature=0.3, google_api_key=GOOGLE_API_KEY)
+def build_food_analysis_chain():
+    from langchain.chains.question_answering import load_qa_chain
+    from langchain.prompts import PromptTemplate
+
     prompt_template = """
         You are a dietary chatbot assisting a user. Analyze the suitability of the identified food based on the user's health profile and available food-related knowledge. Provide a conversational, structured response limited to 150-200 words.
         do not answer in more elabrate. give the answer for the question ** behave like a chatbot. **
@@ -301,8 +353,10 @@ def analyze_food_with_health_and_knowledge(food_label, confidence, user_history,
         (Generate a structured response following the guidelines.)
     """
     prompt = PromptTemplate(template=prompt_template, input_variables=["food_label", "confidence", "user_history", "context"])
-    chain = load_qa_chain(food_analysis_model, chain_type="stuff", prompt=prompt)
-    response = chain.invoke({
+    return load_qa_chain(llm_clients.get_model(temperature=0.3), chain_type="stuff", prompt=prompt)
+
+def analyze_food_with_health_and_knowledge(food_label, confidence, user_history, context, input_documents=None):
+    response = llm_clients.get_chain("food_analysis").invoke({
         "food_label": food_label,
         "confidence": confidence,
         "user_history": user_history,
@@ -311,6 +365,61 @@ def analyze_food_with_health_and_knowledge(food_label, confidence, user_history,
     })
     return response['output_text']
 
+# Combined Meal Analysis Prompt (several dishes from one photo session)
+def build_meal_analysis_chain():
+    from langchain.chains.question_answering import load_qa_chain
+    from langchain.prompts import PromptTemplate
+
+    prompt_template = """
+        You are a dietary chatbot assisting a user. Analyze the suitability of the identified meal as a whole, based on the user's health profile and available food-related knowledge. Provide a conversational, structured response limited to 200-250 words.
+        do not answer in more elabrate. give the answer for the question ** behave like a chatbot. **
+        *Dishes Identified:* {food_items}  
+        *User Health Profile:* {user_history}  
+        *Food Knowledge Context:* {context}  
+
+        ### *Response Guidelines:**(if needed and give only the necessary information and sub headings)
+        - **Greeting & Acknowledgment**:  
+          Greet the user by name (if available) or generically and acknowledge the dishes identified briefly. This should be a standalone paragraph.  
+
+        - **Meal Balance** (if applicable):  
+          Comment on the overall balance of the meal (carbs, protein, fats, vegetables) as bullet points using '* - '.  
+
+        - **Dietary Recommendations** (if applicable):  
+          Offer 2-3 key dietary suggestions for the meal as bullet points using '* - '. Tailor to user history (e.g., allergies, conditions).  
+
+        - **Health Warnings** (if applicable):  
+          Highlight 2-3 potential health concerns as bullet points using '* - ', naming the dish each applies to.  
+
+        - **Next Steps & Support**:  
+          Suggest 1-2 actionable steps and include a call to action (e.g., "Would you like more details?").  
+
+        *Constraints:*  
+        - Start sections with '- **Section Name:**'.  
+        - Use '* - ' for bullets, '1. ' for numbered lists.  
+        - Avoid jargon unless explained.  
+        - Prioritize user history over general knowledge if conflicts arise.  
+        - Use general guidelines if food knowledge is absent.
+
+        *Answer:*  
+        (Generate a structured response following the guidelines.)
+    """
+    prompt = PromptTemplate(template=prompt_template, input_variables=["food_items", "user_history", "context"])
+    return load_qa_chain(llm_clients.get_model(temperature=0.3), chain_type="stuff", prompt=prompt)
+
+def analyze_meal_with_health_and_knowledge(food_items, user_history, context, input_documents=None):
+    response = llm_clients.get_chain("meal_analysis").invoke({
+        "food_items": ", ".join(f"{label} (confidence: {confidence:.2f}%)" for label, confidence in food_items),
+        "user_history": user_history,
+        "context": context if context else "No specific food knowledge available. Using general dietary guidelines.",
+        "input_documents": input_documents or []
+    })
+    return response['output_text']
+
+# Chains are built once per process (in init_llm) and shared by every request
+llm_clients.register_chain("medical_qa", build_conversational_chain)
+llm_clients.register_chain("food_analysis", build_food_analysis_chain)
+llm_clients.register_chain("meal_analysis", build_meal_analysis_chain)
+
 # Helper functions
 def hash_password(password):
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
@@ -366,24 +475,6 @@ def format_user_profile(user):
     }
     return ', '.join(f"{key}: {value}" for key, value in fields.items())
 
-# Function to create Weaviate schema for a user
-def create_user_schema(client, user_id):
-    class_name = f"User_{user_id}"
-    schema = {
-        "class": class_name,
-        "vectorizer": "none",
-        "properties": [
-            {"name": "content", "dataType": ["text"]}
-        ]
-    }
-    exists = client.schema.exists(class_name)
-    if not exists:
-        client.schema.create_class(schema)
-        logger.info(f"Created Weaviate class: {class_name}")
-    else:
-        logger.info(f"Class {class_name} already exists")
-    return class_name, exists
-
 # Chunk text function
 def chunk_text(text, chunk_size=500):
     """Chunk text into segments of specified word size."""
@@ -392,6 +483,93 @@ def chunk_text(text, chunk_size=500):
     logger.info(f"Text chunked into {len(chunks)} segments")
     return chunks
 
+# Classify food images, serving repeated images from the perceptual-hash cache
+def classify_food_images(processed_images):
+    image_hashes = [perceptual_hash(image) for image in processed_images]
+    results = [None] * len(processed_images)
+    misses = []
+    for i, image_hash in enumerate(image_hashes):
+        cached = food_prediction_cache.get(image_hash)
+        if cached:
+            results[i] = (cached["label"], cached["confidence"], [tuple(p) for p in cached["top_k"]])
+            logger.info(f"Food prediction cache hit for image hash {image_hash}")
+        else:
+            misses.append(i)
+    if misses:
+        predictions = food_classifier.predict_many([processed_images[i] for i in misses])
+        for i, (label, confidence, top_predictions) in zip(misses, predictions):
+            results[i] = (label, confidence, top_predictions)
+            food_prediction_cache.put(image_hashes[i], {"label": label, "confidence": confidence, "top_k": top_predictions})
+    return results, image_hashes
+
+# Cache key for an analysis of the given images for a given user profile
+def food_analysis_key(image_hashes, user_history):
+    return hashlib.sha256(f"{','.join(image_hashes)}|{user_history}".encode('utf-8')).hexdigest()
+
+# Live food knowledge search, used only when the precomputed index cannot answer
+def search_food_knowledge(query, k=3):
+    food_docs = []
+    if weaviate_client and vector_stores.class_exists("food_analyse"):
+        food_vector_store = vector_stores.store("food_analyse")
+        try:
+            count = weaviate_client.query.aggregate("food_analyse").with_meta_count().do().get("data", {}).get("Aggregate", {}).get("food_analyse", [{}])[0].get("meta", {}).get("count", 0)
+            if count > 0:
+                food_docs = food_vector_store.similarity_search(query, k=k)
+                logger.info("Successfully retrieved food knowledge from Weaviate.")
+            else:
+                logger.warning("food_analyse collection is empty.")
+        except Exception as e:
+            logger.warning(f"Similarity search failed: {str(e)}. Falling back to general guidelines.")
+    else:
+        logger.warning("food_analyse class does not exist or Weaviate client is unavailable.")
+    return food_docs
+
+# Food knowledge for one or more detected labels, served from the precomputed index
+def retrieve_food_knowledge(labels, k=3):
+    if isinstance(labels, str):
+        labels = [labels]
+    food_docs = []
+    missing = []
+    for label in labels:
+        docs = food_knowledge_index.lookup(label)
+        if docs is None:
+            missing.append(label)
+        else:
+            food_docs.extend(docs)
+    if missing:
+        logger.info(f"Food knowledge index not ready for {', '.join(missing)}. Using live search.")
+        food_docs.extend(search_food_knowledge(", ".join(missing), k=k))
+
+    # The same chunk can be relevant to several dishes
+    seen = set()
+    food_docs = [d for d in food_docs if not (d.page_content in seen or seen.add(d.page_content))]
+    food_knowledge = "\n".join([d.page_content for d in food_docs]) if food_docs else "No specific food knowledge available."
+    return food_knowledge, food_docs
+
+# Store a food analysis in food_analyse and return the collection size
+def store_food_analysis(analysis_text):
+    if analysis_text and weaviate_client:
+        chunks = chunk_text(analysis_text)
+        embeddings_list = embeddings.embed_documents(chunks)
+        with weaviate_client.batch as batch:
+            for chunk, embedding in zip(chunks, embeddings_list):
+                batch.add_data_object(
+                    data_object={"text": chunk},
+                    class_name="food_analyse",
+                    vector=embedding
+                )
+        # Safely handle aggregate query
+        try:
+            count = weaviate_client.query.aggregate("food_analyse").with_meta_count().do().get("data", {}).get("Aggregate", {}).get("food_analyse", [{}])[0].get("meta", {}).get("count", 0)
+        except (KeyError, IndexError) as e:
+            logger.warning(f"Failed to retrieve count for food_analyse: {str(e)}. Defaulting to 0.")
+            count = 0
+        food_knowledge_index.mark_stale()
+    else:
+        logger.warning("No analysis text or Weaviate client available. Skipping upload.")
+        count = 0
+    return count
+
 # JWT token verification middleware
 def token_required(f):
     @wraps(f)
@@ -423,12 +601,14 @@ def token_required(f):
 
         request.user_id = user_id
         request.is_admin = is_admin
+        request.user = user
         return f(*args, **kwargs)
 
     return decorated
 
 # Admin login route
 @app.route('/api/admin_login', methods=['POST'])
+@requires("mongo")
 def admin_login():
     try:
         data = request.get_json()
@@ -458,6 +638,7 @@ def admin_login():
 # Admin route for uploading PDFs
 @app.route('/api/upload', methods=['POST'])
 @token_required
+@requires("mongo", "embeddings")
 def admin_upload():
     try:
         if not request.is_admin:
@@ -474,7 +655,11 @@ def admin_upload():
             collection = request.form.get('collection', 'Admin')  # Default to Admin if not specified
             if collection not in ['Admin', 'food_analyse']:
                 return jsonify({'error': 'Invalid collection. Use "Admin" or "food_analyse"'}), 400
+            from process_admin_pdf import process_admin_pdf
+
             result = process_admin_pdf(file, collection)
+            if collection == 'food_analyse':
+                food_knowledge_index.refresh_async()
             return jsonify({'message': result})
         else:
             return jsonify({'error': 'Unsupported file type. Upload a PDF file'}), 400
@@ -485,8 +670,56 @@ def admin_upload():
         logger.error(f"Error in admin PDF processing: {str(e)}")
         return jsonify({'error': f'Failed to process PDF: {str(e)}'}), 500
 
+# Bulk admin ingestion runs one job at a time; each job pipelines its documents internally
+ingest_executor = ThreadPoolExecutor(max_workers=int(os.getenv("INGEST_JOB_WORKERS", "1")), thread_name_prefix="ingest")
+
+# Admin route for uploading several PDFs (or ZIPs of PDFs) as a background job
+@app.route('/api/upload/bulk', methods=['POST'])
+@token_required
+@requires("mongo", "embeddings")
+def admin_bulk_upload():
+    try:
+        if not request.is_admin:
+            return jsonify({'error': 'Unauthorized: Admin access required'}), 403
+
+        files = [file for file in request.files.getlist('files') if file.filename]
+        if not files:
+            return jsonify({'error': 'No files uploaded'}), 400
+
+        collection = request.form.get('collection', 'Admin')
+        if collection not in ['Admin', 'food_analyse']:
+            return jsonify({'error': 'Invalid collection. Use "Admin" or "food_analyse"'}), 400
+
+        documents, rejected = expand_uploads(files)
+        if not documents:
+            return jsonify({'error': 'No PDF documents found in the upload', 'rejected': rejected}), 400
+
+        job_id = job_store.create("admin_ingest", request.user_id, [name for name, _ in documents],
+                                  collection=collection, rejected=rejected)
+        on_complete = food_knowledge_index.refresh_async if collection == 'food_analyse' else None
+        ingest_executor.submit(run_ingestion_job, job_store, job_id, documents, collection, on_complete)
+        return jsonify({'job_id': job_id, 'documents': len(documents), 'rejected': rejected}), 202
+    except Exception as e:
+        logger.error(f"Error starting bulk admin ingestion: {str(e)}")
+        return jsonify({'error': f'Failed to start ingestion: {str(e)}'}), 500
+
+# Background job status route
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@token_required
+@requires("mongo")
+def get_job(job_id):
+    try:
+        job = job_store.get(job_id)
+        if not job or (job['owner'] != str(request.user_id) and not request.is_admin):
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job), 200
+    except Exception as e:
+        logger.error(f"Error fetching job {job_id}: {str(e)}")
+        return jsonify({'error': f'Failed to fetch job: {str(e)}'}), 500
+
 # Signup route
 @app.route('/api/signup', methods=['POST'])
+@requires("mongo")
 def signup():
     try:
         logger.debug("Received signup request: %s", request.get_json())
@@ -528,9 +761,6 @@ def signup():
         user_id = str(result.inserted_id)
         token = generate_token(user_id)
 
-        if weaviate_client:
-            create_user_schema(weaviate_client, user_id)
-
         return jsonify({
             "message": "User created successfully",
             "user_id": user_id,
@@ -543,6 +773,7 @@ def signup():
 
 # Login route
 @app.route('/api/login', methods=['POST'])
+@requires("mongo")
 def login():
     try:
         data = request.get_json()
@@ -575,6 +806,7 @@ def login():
 # Profile setup route (POST)
 @app.route('/api/profile', methods=['POST'])
 @token_required
+@requires("mongo", "weaviate", "embeddings")
 def set_profile():
     try:
         user_id = request.user_id
@@ -661,26 +893,20 @@ def set_profile():
         )
 
         if weaviate_client:
-            class_name, exists = create_user_schema(weaviate_client, user_id)
             try:
-                if exists:
-                    result = weaviate_client.data_object.get(class_name=class_name)
-                    if result and 'objects' in result:
-                        for obj in result['objects']:
-                            weaviate_client.data_object.delete(
-                                uuid=obj['_additional']['id'],
-                                class_name=class_name
-                            )
-                        logger.info(f"Deleted existing objects in Weaviate class: {class_name}")
+                delete_where(weaviate_client, USER_PROFILE_CLASS, tenant_filter(user_id))
                 formatted_data = format_user_profile(updated_user)
                 logger.info(f"Formatted user profile for Weaviate: {formatted_data}")
                 chunks = chunk_text(formatted_data, chunk_size=500)
                 embeddings_list = embeddings.embed_documents(chunks)
-                weaviate_client.data_object.create_many(
-                    [{"text": chunk, "vector": embedding} for chunk, embedding in zip(chunks, embeddings_list)],
-                    class_name=class_name
-                )
-                logger.info(f"Stored/Updated user data in Weaviate class: {class_name}")
+                with weaviate_client.batch as batch:
+                    for chunk, embedding in zip(chunks, embeddings_list):
+                        batch.add_data_object(
+                            data_object={"content": chunk, "user_id": user_id},
+                            class_name=USER_PROFILE_CLASS,
+                            vector=embedding
+                        )
+                logger.info(f"Stored/Updated user data in Weaviate class {USER_PROFILE_CLASS} for user {user_id}")
             except Exception as e:
                 logger.error(f"Error storing/updating data in Weaviate: {str(e)}")
 
@@ -692,6 +918,7 @@ def set_profile():
 # Profile retrieval route (GET)
 @app.route('/api/profile', methods=['GET'])
 @token_required
+@requires("mongo")
 def get_profile():
     try:
         user_id = request.user_id
@@ -706,9 +933,246 @@ def get_profile():
         logger.error(f"Error during profile retrieval: {str(e)}")
         return jsonify({"error": "Failed to retrieve profile. Please try again later."}), 500
 
+# Retrieval lookups run concurrently; a source slower than the timeout degrades to no context
+RETRIEVAL_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_TIMEOUT_SECONDS", "5"))
+retrieval_executor = ThreadPoolExecutor(max_workers=int(os.getenv("RETRIEVAL_WORKERS", "16")), thread_name_prefix="retrieval")
+
+def _timed_lookup(source, lookup):
+    start = time.time()
+    try:
+        return lookup()
+    finally:
+        logger.info(f"Retrieval source {source} took {time.time() - start:.3f}s")
+
+def fan_out_retrieval(lookups, timeout=RETRIEVAL_TIMEOUT_SECONDS):
+    """Run the lookups in parallel; return (results by source, sources that timed out or failed)."""
+    start = time.time()
+    futures = {source: retrieval_executor.submit(_timed_lookup, source, lookup) for source, lookup in lookups.items()}
+    results = {}
+    degraded = []
+    for source, future in futures.items():
+        try:
+            results[source] = future.result(timeout=max(0.0, start + timeout - time.time()))
+        except FuturesTimeoutError:
+            logger.warning(f"Retrieval source {source} timed out after {timeout}s. Continuing without it.")
+            results[source] = []
+            degraded.append(source)
+        except Exception as e:
+            logger.warning(f"Retrieval source {source} failed: {str(e)}. Continuing without it.")
+            results[source] = []
+            degraded.append(source)
+    logger.info(f"Retrieval fan-out over {', '.join(lookups)} finished in {time.time() - start:.3f}s")
+    return results, degraded
+
+# Chat retrieval: the query is embedded once and the vector is reused for every store
+def retrieve_chat_context(user_id, user_message, include_admin=True):
+    query_vector = embeddings.embed_query(user_message)
+
+    def search_user_profile():
+        user_vector_store = vector_stores.store(USER_PROFILE_CLASS, text_key="content")
+        return user_vector_store.similarity_search_by_vector(query_vector, k=1, where_filter=tenant_filter(user_id))
+
+    def search_medical_report():
+        medical_report_vector_store = vector_stores.store(MEDICAL_REPORT_CLASS)
+        return medical_report_vector_store.similarity_search_by_vector(query_vector, k=3, where_filter=tenant_filter(user_id),
+                                                                       additional=["distance"])
+
+    def search_admin():
+        admin_vector_store = vector_stores.store("Admin")
+        return admin_vector_store.similarity_search_by_vector(query_vector, k=3, additional=["distance"])
+
+    lookups = {"user_profile": search_user_profile, "medical_report": search_medical_report}
+    if include_admin:
+        lookups["admin"] = search_admin
+    results, degraded = fan_out_retrieval(lookups)
+
+    return {
+        "query_vector": query_vector,
+        "user_docs": results["user_profile"],
+        "medical_report_docs": results["medical_report"],
+        "admin_docs": results.get("admin", []),
+        "degraded": degraded
+    }
+
+# Medical report jobs: threads orchestrate, the extraction pool (report_extract.py) does the OCR
+report_executor = ThreadPoolExecutor(max_workers=int(os.getenv("REPORT_JOB_WORKERS", "4")), thread_name_prefix="report")
+# In-flight report records name the process running the job. Jobs of this process are
+# checked against active_report_jobs; another process's job counts as abandoned once it
+# has gone this long without a progress update (it crashed or was restarted).
+REPORT_JOB_STALE_SECONDS = float(os.getenv("REPORT_JOB_STALE_SECONDS", "900"))
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+active_report_jobs = set()
+
+def extract_medical_report_text(data, filename):
+    if inference_client or REPORT_OCR_PROCESSES <= 0:
+        return extract_report_text(data, filename, ocr=ocr)
+    return get_extraction_pool().submit(extract_report_text, data, filename).result()
+
+def report_key(user_id, content_hash):
+    return f"{user_id}:{content_hash}"
+
+def release_report(user_id, content_hash, job_id):
+    """Drop the in-flight record of a failed report job, so the next upload of the file starts over."""
+    reports_collection.delete_one({"_id": report_key(user_id, content_hash), "job_id": job_id, "status": "processing"})
+
+def store_report_chunks(user_id, content_hash, chunks, vectors):
+    """Write report chunks with ids derived from (user, report hash, position), so a repeat write overwrites."""
+    from weaviate.util import generate_uuid5
+
+    with weaviate_client.batch as batch:
+        for i, (chunk, embedding) in enumerate(zip(chunks, vectors)):
+            batch.add_data_object(
+                data_object={"text": chunk, "user_id": user_id},
+                class_name=MEDICAL_REPORT_CLASS,
+                uuid=generate_uuid5(f"{report_key(user_id, content_hash)}:{i}", MEDICAL_REPORT_CLASS),
+                vector=embedding
+            )
+    logger.info(f"Stored {len(chunks)} report chunks in {MEDICAL_REPORT_CLASS} for user {user_id}")
+
+def report_job_alive(report):
+    """Whether the job behind an in-flight report record can still finish."""
+    if report.get("worker") == PROCESS_ID:
+        return report["job_id"] in active_report_jobs
+    return job_store.is_active(report["job_id"], REPORT_JOB_STALE_SECONDS)
+
+def process_medical_report(job_id, user_id, data, filename, content_hash):
+    from langchain.schema import Document
+
+    active_report_jobs.add(job_id)
+    try:
+        job_store.update(job_id, status=jobs.RUNNING, stage="extracting")
+        extracted_text = extract_medical_report_text(data, filename)
+        if not extracted_text:
+            job_store.update(job_id, status=jobs.FAILED, error='No text extracted from the file')
+            release_report(user_id, content_hash, job_id)
+            return
+
+        # Chunk and store in Weaviate
+        job_store.update(job_id, stage="embedding")
+        chunks = chunk_text(extracted_text, chunk_size=500)
+        embeddings_list = embeddings.embed_documents(chunks)
+        store_report_chunks(user_id, content_hash, chunks, embeddings_list)
+        bump_report_version(user_id)
+
+        # Generate summary using LLM
+        job_store.update(job_id, stage="summarizing")
+        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        user_history = format_user_profile(user) if user else "No user history available."
+        user_name = user_history.split("full_name:")[1].split(",")[0].strip() if "full_name:" in user_history else "there"
+
+        # This report's own chunks, in reading order, up to the token budget; the report
+        # reaches the prompt once, as the context documents
+        question = f"Hi {user_name}! Provide a concise summary of the medical report in the context."
+        report_docs, _ = build_context([Document(page_content=chunk) for chunk in chunks],
+                                       reserved_text=(user_history, question))
+
+        chain = get_conversational_chain()
+        summary_response = chain.invoke({
+            "input_documents": report_docs,
+            "user_history": user_history,
+            "question": question
+        })
+        summary = format_response_to_html(summary_response['output_text'])
+
+        # Remember the result (replacing the in-flight record) so a repeat upload of the same file skips all of the above
+        reports_collection.replace_one({"_id": report_key(user_id, content_hash)}, {
+            "user_id": user_id,
+            "content_hash": content_hash,
+            "filename": filename,
+            "text": extracted_text,
+            "chunks": chunks,
+            "vectors": [list(vector) for vector in embeddings_list],
+            "summary": summary,
+            "created_at": datetime.utcnow()
+        }, upsert=True)
+
+        job_store.update(job_id, status=jobs.COMPLETED, stage="done", result={
+            'summary': summary,
+            'response': '<p>Your medical report has been processed. Please ask any questions!</p>'
+        })
+    except Exception as e:
+        logger.error(f"Error processing medical report job {job_id}: {str(e)}", exc_info=True)
+        job_store.update(job_id, status=jobs.FAILED, error=f'Failed to process medical report: {str(e)}')
+        release_report(user_id, content_hash, job_id)
+    finally:
+        active_report_jobs.discard(job_id)
+
+# Semantic answer cache: near-duplicate questions from the same user, with the same profile
+# and report state, get the stored answer without retrieval or an LLM call
+answer_cache = SemanticAnswerCache(
+    "chat_answers",
+    threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92")),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+    maxsize=int(os.getenv("ANSWER_CACHE_SIZE", "2000"))
+)
+
+def is_greeting_message(user_message):
+    return any(keyword in user_message.lower() for keyword in ["hi", "hello", "name"])
+
+def answer_scope(user_id, user):
+    """Hash of everything that personalizes an answer: the user, their profile and their report state."""
+    profile = format_user_profile(user) if user else ""
+    report_version = user.get("report_version", 0) if user else 0
+    return hashlib.sha256(f"{user_id}|{report_version}|{profile}".encode('utf-8')).hexdigest()
+
+def bump_report_version(user_id):
+    """Mark the user's report context as changed, so cached answers for the old one stop matching."""
+    users_collection.update_one({"_id": ObjectId(user_id)}, {"$inc": {"report_version": 1}})
+
+def lookup_cached_answer(user_id, user, user_message):
+    """Return (scope, query_vector, cached_html); greetings are never cached and return (None, None, None)."""
+    if is_greeting_message(user_message):
+        return None, None, None
+    scope = answer_scope(user_id, user)
+    # The same embedding is reused by retrieval on a miss (it is served from the embedding cache)
+    query_vector = embeddings.embed_query(user_message)
+    return scope, query_vector, answer_cache.get(scope, query_vector)
+
+def prepare_chat(user_id, user_message):
+    """Retrieve context for a chat message; return (immediate_reply, None, cacheable) or (None, medical QA chain inputs, cacheable).
+
+    cacheable is False when a retrieval source timed out or failed, so an answer built
+    without part of its context is not stored in the answer cache.
+    """
+    is_greeting = is_greeting_message(user_message)
+    retrieval = retrieve_chat_context(user_id, user_message, include_admin=not is_greeting)
+    user_docs = retrieval["user_docs"]
+    medical_report_docs = retrieval["medical_report_docs"]
+    user_history = "\n".join([d.page_content for d in user_docs]) if user_docs else "No user history available."
+    cacheable = not retrieval["degraded"]
+
+    user_name = "there"
+    try:
+        if user_history and "full_name:" in user_history:
+            user_name = user_history.split("full_name:")[1].split(",")[0].strip()
+    except IndexError:
+        user_name = "there"
+
+    if is_greeting:
+        return get_general_response(user_message, user_history), None, cacheable
+
+    is_fever_related = "fever" in user_message.lower()
+    is_diet_related = any(keyword in user_message.lower() for keyword in ["food", "eat", "diet"])
+
+    admin_docs = retrieval["admin_docs"]
+    if is_fever_related and is_diet_related and "No user history available" in user_history:
+        user_history = "User reports a fever but no detailed medical history provided."
+        question = f"Hi {user_name}! What types of food can someone with a fever eat based on general nutritional guidelines?"
+    else:
+        question = f"Hi {user_name}! {user_message}"
+
+    # Rank admin and report chunks together, drop overlaps and fit them to the token budget
+    context_docs, _ = build_context(admin_docs + medical_report_docs, reserved_text=(user_history, question))
+    return None, {
+        "input_documents": context_docs,
+        "user_history": user_history,
+        "question": question
+    }, cacheable
+
 # Chat route for text-based queries
 @app.route('/api/ask', methods=['POST'])
 @token_required
+@requires("mongo", "weaviate", "embeddings", "llm")
 def ask():
     try:
         data = request.get_json()
@@ -719,79 +1183,90 @@ def ask():
         if not user_message:
             return jsonify({'error': 'Message is required'}), 400
 
-        user_class_name = f"User_{user_id}"
-        user_vector_store = Weaviate(
-            client=weaviate_client,
-            index_name=user_class_name,
-            text_key="content",
-            embedding=embeddings,
-            by_text=False
-        )
-        user_docs = user_vector_store.similarity_search(user_message, k=1)
-        user_history = "\n".join([d.page_content for d in user_docs]) if user_docs else "No user history available."
-
-        medical_report_class_name = f"User_{user_id}_MedicalReport"
-        medical_report_docs = []
-        if weaviate_client and weaviate_client.schema.exists(medical_report_class_name):
-            medical_report_vector_store = Weaviate(
-                client=weaviate_client,
-                index_name=medical_report_class_name,
-                text_key="text",
-                embedding=embeddings,
-                by_text=False
-            )
-            medical_report_docs = medical_report_vector_store.similarity_search(user_message, k=3)
+        scope, query_vector, cached_response = lookup_cached_answer(user_id, request.user, user_message)
+        if cached_response:
+            logger.info(f"Answer cache hit for user {user_id}")
+            return jsonify({'response': cached_response})
 
-        user_name = "there"
-        try:
-            if user_history and "full_name:" in user_history:
-                user_name = user_history.split("full_name:")[1].split(",")[0].strip()
-        except IndexError:
-            user_name = "there"
-
-        if any(keyword in user_message.lower() for keyword in ["hi", "hello", "name"]):
-            response = get_general_response(user_message, user_history)
-            formatted_response = format_response_to_html(response)
-            return jsonify({'response': formatted_response})
-
-        is_fever_related = "fever" in user_message.lower()
-        is_diet_related = any(keyword in user_message.lower() for keyword in ["food", "eat", "diet"])
-
-        admin_vector_store = Weaviate(
-            client=weaviate_client,
-            index_name="Admin",
-            text_key="text",
-            embedding=embeddings,
-            by_text=False
-        )
-        admin_docs = admin_vector_store.similarity_search(user_message, k=3)
-
-        chain = get_conversational_chain()
-        context_docs = admin_docs + medical_report_docs if medical_report_docs else admin_docs
-        if is_fever_related and is_diet_related and "No user history available" in user_history:
-            response = chain.invoke({
-                "input_documents": context_docs,
-                "user_history": "User reports a fever but no detailed medical history provided.",
-                "question": f"Hi {user_name}! What types of food can someone with a fever eat based on general nutritional guidelines?"
-            })
-        else:
-            response = chain.invoke({
-                "input_documents": context_docs,
-                "user_history": user_history,
-                "question": f"Hi {user_name}! {user_message}"
-            })
+        reply, chain_inputs, cacheable = prepare_chat(user_id, user_message)
+        if reply is not None:
+            return jsonify({'response': format_response_to_html(reply)})
 
+        response = get_conversational_chain().invoke(chain_inputs)
         formatted_response = format_response_to_html(response['output_text'])
         logger.info(f"Raw response: {response['output_text']}")
         logger.info(f"Formatted response: {formatted_response}")
+        if scope and cacheable:
+            answer_cache.put(scope, query_vector, formatted_response)
         return jsonify({'response': formatted_response})
     except Exception as e:
         logger.error(f"Error processing chat request: {str(e)}")
         return jsonify({'error': f"Failed to process chat request: {str(e)}"}), 500
 
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+# Streaming chat route: the answer arrives as server-sent events while Gemini generates it
+@app.route('/api/ask/stream', methods=['POST'])
+@token_required
+@requires("mongo", "weaviate", "embeddings", "llm")
+def ask_stream():
+    data = request.get_json() or {}
+    user_message = data.get('message')
+    user_id = request.user_id
+    user = request.user
+    logger.info(f"User {user_id} entered in chat (stream): {user_message}")
+
+    if not user_message:
+        return jsonify({'error': 'Message is required'}), 400
+
+    def generate():
+        # Events: 'token' (raw text delta), 'html' (fragments for finished lines), 'done' (full HTML), 'error'
+        start = time.time()
+        formatter = IncrementalHtmlFormatter()
+        html_parts = []
+        raw_parts = []
+        try:
+            scope, query_vector, cached_response = lookup_cached_answer(user_id, user, user_message)
+            if cached_response:
+                logger.info(f"Answer cache hit for user {user_id}")
+                yield sse_event("html", {"html": cached_response})
+                yield sse_event("done", {"response": cached_response})
+                return
+
+            reply, chain_inputs, cacheable = prepare_chat(user_id, user_message)
+            tokens = [reply] if reply is not None else llm_clients.stream_chain("medical_qa", chain_inputs)
+            for token in tokens:
+                if not token:
+                    continue
+                if not raw_parts:
+                    logger.info(f"First chat token for user {user_id} after {time.time() - start:.2f}s")
+                raw_parts.append(token)
+                yield sse_event("token", {"text": token})
+                html = formatter.feed(token)
+                if html:
+                    html_parts.append(html)
+                    yield sse_event("html", {"html": html})
+            html = formatter.close()
+            if html:
+                html_parts.append(html)
+                yield sse_event("html", {"html": html})
+            formatted_response = ''.join(html_parts) or format_response_to_html(''.join(raw_parts))
+            logger.info(f"Streamed response in {time.time() - start:.2f}s: {''.join(raw_parts)}")
+            if scope and cacheable and reply is None:
+                answer_cache.put(scope, query_vector, formatted_response)
+            yield sse_event("done", {"response": formatted_response})
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {str(e)}")
+            yield sse_event("error", {"error": f"Failed to process chat request: {str(e)}"})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # User image upload route for food detection
 @app.route('/api/upload-image', methods=['POST'])
 @token_required
+@requires("mongo", "food_classifier", "weaviate", "embeddings", "llm")
 def upload_image():
     try:
         if 'file' not in request.files:
@@ -802,113 +1277,54 @@ def upload_image():
             return jsonify({'error': 'No image selected'}), 400
 
         if file and (file.filename.endswith('.jpg') or file.filename.endswith('.jpeg')):
-            # Load the SavedModel using TFSMLayer
-            model_path = "D:/Users 2.o/PY charm/flask/chatbot/medical-bot-backend/model/final_v1_xception_savedmodel"
-            model = TFSMLayer(model_path, call_endpoint='serving_default')
-            logger.info("Model loaded successfully.")
-
-            # Class labels
-            class_labels = [
-                'Aloo_matar', 'Besan_cheela', 'Biryani', 'Chapathi', 'Chole_bature',
-                'Dahl', 'Dhokla', 'Dosa', 'Gulab_jamun', 'Idli',
-                'Jalebi', 'Kadai_paneer', 'Naan', 'Paani_puri', 'Pakoda',
-                'Pav_bhaji', 'Poha', 'Rolls', 'Samosa', 'Vada_pav'
-            ]
-
-            # Preprocessing function
-            def preprocess_image_manual(image_path, target_size=(224, 224)):
-                img = load_img(image_path, target_size=target_size)
-                img_array = img_to_array(img)
-                img_array = np.expand_dims(img_array, axis=0)
-                img_array = img_array / 255.0  # Normalize as per the standalone code
-                return img_array
-
-            # Save temporary image and detect food
-            image_path = f"temp_{file.filename}"
-            file.save(image_path)
-
-            # Predict
-            processed_image = preprocess_image_manual(image_path)
-            outputs = model(processed_image, training=False)
-            predictions = list(outputs.values())[0].numpy()
-
-            predicted_class_index = np.argmax(predictions, axis=1)[0]
-            predicted_class_label = class_labels[predicted_class_index]
-            confidence = predictions[0][predicted_class_index] * 100
-            logger.info(f"Detected food: {predicted_class_label} with confidence {confidence:.2f}%")
+            # Decode the upload in memory and detect food
+            processed_image = load_classifier_input(read_upload(file), file.filename)
 
-            os.remove(image_path)  # Clean up temporary file
+            # Predict (repeated images are served from the cache)
+            results, image_hashes = classify_food_images([processed_image])
+            predicted_class_label, confidence, top_predictions = results[0]
+            logger.info(f"Detected food: {predicted_class_label} with confidence {confidence:.2f}%")
 
             # User and Food Knowledge Retrieval (Chatbot-style)
             logger.info("Retrieving user profile and food knowledge...")
             user_id = request.user_id
             user = users_collection.find_one({"_id": ObjectId(user_id)})
             user_history = format_user_profile(user) if user else "No user history available."
-            food_knowledge = "No specific food knowledge available."
-            food_docs = []  # Initialize to avoid UnboundLocalError
-
-            if weaviate_client and weaviate_client.schema.exists("food_analyse"):
-                food_vector_store = Weaviate(
-                    client=weaviate_client,
-                    index_name="food_analyse",
-                    text_key="text",
-                    embedding=embeddings,
-                    by_text=False
-                )
-                try:
-                    count = weaviate_client.query.aggregate("food_analyse").with_meta_count().do().get("data", {}).get("Aggregate", {}).get("food_analyse", [{}])[0].get("meta", {}).get("count", 0)
-                    if count > 0:
-                        food_docs = food_vector_store.similarity_search(predicted_class_label, k=3)
-                        food_knowledge = "\n".join([d.page_content for d in food_docs]) if food_docs else "No specific food knowledge available."
-                        logger.info("Successfully retrieved food knowledge from Weaviate.")
-                    else:
-                        logger.warning("food_analyse collection is empty.")
-                except Exception as e:
-                    logger.warning(f"Similarity search failed: {str(e)}. Falling back to general guidelines.")
+            analysis_key = food_analysis_key(image_hashes, user_history)
+            cached_analysis = food_analysis_cache.get(analysis_key)
+            if cached_analysis:
+                # Same image and same profile: reuse the analysis, it is already stored in food_analyse
+                logger.info(f"Food analysis cache hit for {predicted_class_label}")
+                analysis_text = cached_analysis["analysis"]
+                formatted_response = format_response_to_html(analysis_text)
+                count = cached_analysis["count"]
             else:
-                logger.warning("food_analyse class does not exist or Weaviate client is unavailable.")
-
-            # Food Analysis with LLM (Chatbot-style)
-            logger.info("Analyzing food suitability with LLM...")
-            question = f"What are the dietary recommendations for {predicted_class_label} based on the user's health profile?"
-            analysis_text = analyze_food_with_health_and_knowledge(
-                predicted_class_label,
-                confidence,
-                user_history,
-                food_knowledge if food_knowledge != "No specific food knowledge available" else "No specific food knowledge available. Using general dietary guidelines.",
-                input_documents=food_docs if food_docs else []
-            )
-            logger.info(f"Food analysis response: {analysis_text}")
-            logger.info(f"Response length: {len(analysis_text)} characters")
-
-            # Response Generation and Storage (Chatbot-style)
-            logger.info("Formatting and storing the response...")
-            formatted_response = format_response_to_html(analysis_text)
-            logger.info(f"Formatted response: {formatted_response}")
-            if analysis_text and weaviate_client:
-                chunks = chunk_text(analysis_text)
-                embeddings_list = embeddings.embed_documents(chunks)
-                with weaviate_client.batch as batch:
-                    for chunk, embedding in zip(chunks, embeddings_list):
-                        batch.add_data_object(
-                            data_object={"text": chunk},
-                            class_name="food_analyse",
-                            vector=embedding
-                        )
-                # Safely handle aggregate query
-                try:
-                    count = weaviate_client.query.aggregate("food_analyse").with_meta_count().do().get("data", {}).get("Aggregate", {}).get("food_analyse", [{}])[0].get("meta", {}).get("count", 0)
-                except (KeyError, IndexError) as e:
-                    logger.warning(f"Failed to retrieve count for food_analyse: {str(e)}. Defaulting to 0.")
-                    count = 0
-            else:
-                logger.warning("No analysis text or Weaviate client available. Skipping upload.")
-                count = 0
+                food_knowledge, food_docs = retrieve_food_knowledge(predicted_class_label)
+
+                # Food Analysis with LLM (Chatbot-style)
+                logger.info("Analyzing food suitability with LLM...")
+                analysis_text = analyze_food_with_health_and_knowledge(
+                    predicted_class_label,
+                    confidence,
+                    user_history,
+                    food_knowledge if food_knowledge != "No specific food knowledge available" else "No specific food knowledge available. Using general dietary guidelines.",
+                    input_documents=food_docs if food_docs else []
+                )
+                logger.info(f"Food analysis response: {analysis_text}")
+                logger.info(f"Response length: {len(analysis_text)} characters")
+
+                # Response Generation and Storage (Chatbot-style)
+                logger.info("Formatting and storing the response...")
+                formatted_response = format_response_to_html(analysis_text)
+                logger.info(f"Formatted response: {formatted_response}")
+                count = store_food_analysis(analysis_text)
+                food_analysis_cache.put(analysis_key, {"analysis": analysis_text, "count": count})
 
             # Return chatbot-style response
             response = {
                 'message': f"I’ve detected {predicted_class_label} with {confidence:.2f}% confidence. Here’s my analysis:",
                 'analysis': formatted_response,
+                'top_predictions': [{'label': label, 'confidence': round(score, 2)} for label, score in top_predictions],
                 'storage_info': f"Analysis stored in food_analyse. Total objects: {count}"
             }
             logger.info(f"Returning response: {json.dumps(response)}")  # Debug the exact response
@@ -919,9 +1335,89 @@ def upload_image():
         logger.error(f"Error during image upload: {str(e)}", exc_info=True)
         return jsonify({'error': f'Failed to process image: {str(e)}'}), 500
 
+# Batch image upload route: several dishes analyzed as one meal
+@app.route('/api/upload-images', methods=['POST'])
+@token_required
+@requires("mongo", "food_classifier", "weaviate", "embeddings", "llm")
+def upload_images():
+    try:
+        files = [file for file in request.files.getlist('files') if file.filename]
+        if not files:
+            return jsonify({'error': 'No images uploaded'}), 400
+        if len(files) > MAX_BATCH_IMAGES:
+            return jsonify({'error': f'Too many images. Upload at most {MAX_BATCH_IMAGES} images at once'}), 400
+        unsupported = [file.filename for file in files if not file.filename.lower().endswith(('.jpg', '.jpeg'))]
+        if unsupported:
+            return jsonify({'error': f'Unsupported file type for {", ".join(unsupported)}. Upload images (JPG/JPEG)'}), 400
+
+        # Decode every upload in memory and classify them in one forward pass
+        processed_images = [load_classifier_input(read_upload(file), file.filename) for file in files]
+        results, image_hashes = classify_food_images(processed_images)
+        detections = []
+        for file, (label, confidence, top_predictions) in zip(files, results):
+            logger.info(f"Detected food in {file.filename}: {label} with confidence {confidence:.2f}%")
+            detections.append({
+                'filename': file.filename,
+                'label': label,
+                'confidence': round(confidence, 2),
+                'top_predictions': [{'label': top_label, 'confidence': round(score, 2)} for top_label, score in top_predictions]
+            })
+
+        # User profile and food knowledge are fetched once for the whole meal
+        logger.info("Retrieving user profile and food knowledge for the meal...")
+        user = users_collection.find_one({"_id": ObjectId(request.user_id)})
+        user_history = format_user_profile(user) if user else "No user history available."
+        distinct_labels = list(dict.fromkeys(detection['label'] for detection in detections))
+        analysis_key = food_analysis_key(image_hashes, user_history)
+        cached_analysis = food_analysis_cache.get(analysis_key)
+        if cached_analysis:
+            logger.info(f"Meal analysis cache hit for {', '.join(distinct_labels)}")
+            analysis_text = cached_analysis["analysis"]
+            count = cached_analysis["count"]
+        else:
+            food_knowledge, food_docs = retrieve_food_knowledge(distinct_labels)
+
+            # One combined analysis for the meal
+            logger.info("Analyzing meal suitability with LLM...")
+            food_items = [(label, confidence) for label, confidence, _ in results]
+            analysis_text = analyze_meal_with_health_and_knowledge(food_items, user_history, food_knowledge, input_documents=food_docs)
+            logger.info(f"Meal analysis response length: {len(analysis_text)} characters")
+            count = store_food_analysis(analysis_text)
+            food_analysis_cache.put(analysis_key, {"analysis": analysis_text, "count": count})
+        formatted_response = format_response_to_html(analysis_text)
+
+        response = {
+            'message': f"I’ve detected {len(detections)} dishes: {', '.join(distinct_labels)}. Here’s my analysis of the meal:",
+            'detections': detections,
+            'analysis': formatted_response,
+            'storage_info': f"Analysis stored in food_analyse. Total objects: {count}"
+        }
+        logger.info(f"Returning response: {json.dumps(response)}")
+        return jsonify(response)
+    except Exception as e:
+        logger.error(f"Error during batch image upload: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Failed to process images: {str(e)}'}), 500
+
+# Answer a repeat upload from the report's record: the running job, or the stored result
+def reuse_medical_report(user_id, content_hash, report):
+    if report.get("status") == "processing":
+        logger.info(f"Medical report {content_hash[:12]} is already being processed for user {user_id}; returning job {report['job_id']}")
+        return jsonify({'job_id': report["job_id"], 'status': jobs.RUNNING, 'duplicate': True}), 202
+
+    logger.info(f"Medical report {content_hash[:12]} already processed for user {user_id}; reusing result")
+    # The vectors may have been removed at logout; re-writing them is idempotent
+    store_report_chunks(user_id, content_hash, report["chunks"], report["vectors"])
+    bump_report_version(user_id)
+    return jsonify({
+        'summary': report["summary"],
+        'response': '<p>Your medical report has been processed. Please ask any questions!</p>',
+        'duplicate': True
+    }), 200
+
 # Add new route for medical report upload and OCR with summary
 @app.route('/api/upload-medical-report', methods=['POST'])
 @token_required
+@requires("mongo", "ocr", "weaviate", "embeddings", "llm")
 def upload_medical_report():
     try:
         if 'file' not in request.files:
@@ -930,127 +1426,80 @@ def upload_medical_report():
         file = request.files['file']
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
+        if not file.filename.lower().endswith(REPORT_EXTENSIONS):
+            return jsonify({'error': 'Unsupported file type. Upload an image or a PDF'}), 400
 
+        data = read_upload(file)
         user_id = request.user_id
-        collection_name = f"User_{user_id}_MedicalReport"
-        extracted_text = ""
-
-        # Create Weaviate schema if it doesn't exist
-        if weaviate_client and not weaviate_client.schema.exists(collection_name):
-            schema = {
-                "class": collection_name,
-                "vectorizer": "none",
-                "properties": [
-                    {"name": "text", "dataType": ["text"]}
-                ]
-            }
-            weaviate_client.schema.create_class(schema)
-            logger.info(f"Created Weaviate class: {collection_name}")
-
-        # Process file based on type
-        if file.filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')):
-            # Save temporary file for OCR
-            temp_path = f"temp_{file.filename}"
-            file.save(temp_path)
-            result = ocr.ocr(temp_path, cls=True)
-            extracted_text = "\n".join([line[1][0] for line in result[0] if line])
-            os.remove(temp_path)
-        elif file.filename.lower().endswith('.pdf'):
-            pdf_reader = PyPDF2.PdfReader(file)
-            extracted_text = "\n".join([page.extract_text() or "" for page in pdf_reader.pages])
-
-        if not extracted_text:
-            return jsonify({'error': 'No text extracted from the file'}), 400
-
-        # Chunk and store in Weaviate
-        chunks = chunk_text(extracted_text, chunk_size=500)
-        embeddings_list = embeddings.embed_documents(chunks)
-        with weaviate_client.batch as batch:
-            for chunk, embedding in zip(chunks, embeddings_list):
-                batch.add_data_object(
-                    data_object={"text": chunk},
-                    class_name=collection_name,
-                    vector=embedding
-                )
-        logger.info(f"Stored extracted text in {collection_name}")
-
-        # Generate summary using LLM
-        medical_report_vector_store = Weaviate(
-            client=weaviate_client,
-            index_name=collection_name,
-            text_key="text",
-            embedding=embeddings,
-            by_text=False
-        )
-        report_docs = medical_report_vector_store.similarity_search("summary", k=3)
-        report_context = "\n".join([d.page_content for d in report_docs]) if report_docs else extracted_text[:1000]  # Limit context
-
-        user = users_collection.find_one({"_id": ObjectId(user_id)})
-        user_history = format_user_profile(user) if user else "No user history available."
-        user_name = user_history.split("full_name:")[1].split(",")[0].strip() if "full_name:" in user_history else "there"
-
-        chain = get_conversational_chain()
-        summary_response = chain.invoke({
-            "input_documents": [Document(page_content=report_context)],
-            "user_history": user_history,
-            "question": f"Hi {user_name}! Provide a concise summary of the following medical report: {report_context}"
-        })
-        summary = format_response_to_html(summary_response['output_text'])
-
-        return jsonify({
-            'summary': summary,
-            'response': '<p>Your medical report has been processed. Please ask any questions!</p>'
-        })
+        content_hash = hashlib.sha256(data).hexdigest()
+
+        key = report_key(user_id, content_hash)
+        report = reports_collection.find_one({"_id": key})
+        if report and report.get("status") == "processing":
+            if report_job_alive(report):
+                return reuse_medical_report(user_id, content_hash, report)
+            # The job behind the record failed, expired or was lost with its process; start over
+            logger.warning(f"Report job {report['job_id']} for {content_hash[:12]} is abandoned; reprocessing")
+            job_store.update(report["job_id"], status=jobs.FAILED, error='Processing was interrupted')
+            release_report(user_id, content_hash, report["job_id"])
+            report = None
+        if report:
+            return reuse_medical_report(user_id, content_hash, report)
+
+        # OCR, embedding and summarization run in the background; the client polls /api/jobs/<job_id>.
+        # The in-flight record makes a repeat upload during processing join this job.
+        job_id = job_store.create("medical_report", user_id, [file.filename], stage="queued")
+        try:
+            reports_collection.insert_one({
+                "_id": key,
+                "user_id": user_id,
+                "content_hash": content_hash,
+                "filename": file.filename,
+                "status": "processing",
+                "job_id": job_id,
+                "worker": PROCESS_ID,
+                "created_at": datetime.utcnow()
+            })
+        except DuplicateKeyError:
+            # A concurrent upload of the same file got there first
+            job_store.delete(job_id)
+            report = reports_collection.find_one({"_id": key})
+            if not report:
+                return jsonify({'error': 'Medical report is being reprocessed. Please try again.'}), 409
+            return reuse_medical_report(user_id, content_hash, report)
+        report_executor.submit(process_medical_report, job_id, user_id, data, file.filename, content_hash)
+        return jsonify({'job_id': job_id, 'status': jobs.QUEUED}), 202
     except Exception as e:
-        logger.error(f"Error processing medical report: {str(e)}")
+        logger.error(f"Error queuing medical report: {str(e)}")
         return jsonify({'error': f'Failed to process medical report: {str(e)}'}), 500
 
 # Add logout route to delete user-specific collection
 @app.route('/api/logout', methods=['POST'])
 @token_required
+@requires("mongo", "weaviate")
 def logout_user():
     try:
         user_id = request.user_id
-        collection_name = f"User_{user_id}_MedicalReport"
-        logger.info(f"Attempting to clean up Weaviate collection: {collection_name} for user_id: {user_id}")
+        collection_name = MEDICAL_REPORT_CLASS
+        logger.info(f"Attempting to clean up {collection_name} objects for user_id: {user_id}")
+
+        # Stored report text, chunks, vectors and summaries go with the Weaviate objects
+        try:
+            removed = reports_collection.delete_many({"user_id": user_id}).deleted_count
+            logger.info(f"Removed {removed} stored medical reports for user {user_id}")
+        except Exception as e:
+            logger.error(f"Error deleting stored medical reports for user {user_id}: {str(e)}")
+            return jsonify({'error': f'Failed to clean up medical reports: {str(e)}'}), 500
 
         if weaviate_client:
-            # Check if the collection exists
-            if weaviate_client.schema.exists(collection_name):
-                logger.info(f"Collection {collection_name} exists. Proceeding with cleanup.")
-
-                # Step 1: Delete all objects in the collection
-                try:
-                    # Use a query to fetch all objects and delete them
-                    response = weaviate_client.query.get(collection_name, ["text"]).do()
-                    objects = response.get('data', {}).get('Get', {}).get(collection_name, [])
-                    if objects:
-                        for obj in objects:
-                            uuid = obj.get('_additional', {}).get('id')
-                            if uuid:
-                                weaviate_client.data_object.delete(
-                                    uuid=uuid,
-                                    class_name=collection_name
-                                )
-                                logger.info(f"Deleted object with UUID: {uuid} from {collection_name}")
-                            else:
-                                logger.warning(f"Object missing UUID: {obj}")
-                        logger.info(f"Successfully deleted all objects from {collection_name}")
-                    else:
-                        logger.info(f"No objects found in {collection_name} to delete")
-                except Exception as e:
-                    logger.error(f"Error deleting objects from {collection_name}: {str(e)}")
-                    # Continue to schema deletion even if object deletion fails
-
-                # Step 2: Delete the schema
-                try:
-                    weaviate_client.schema.delete_class(collection_name)
-                    logger.info(f"Successfully deleted Weaviate class: {collection_name}")
-                except Exception as e:
-                    logger.error(f"Error deleting schema {collection_name}: {str(e)}")
-                    return jsonify({'error': f'Failed to delete schema {collection_name}: {str(e)}'}), 500
-            else:
-                logger.info(f"Collection {collection_name} does not exist. No cleanup needed.")
+            # Delete only this user's report objects; the shared class stays
+            try:
+                deleted = delete_where(weaviate_client, collection_name, tenant_filter(user_id))
+                logger.info(f"Logout cleanup for user {user_id}: {deleted}")
+                bump_report_version(user_id)
+            except Exception as e:
+                logger.error(f"Error deleting objects from {collection_name}: {str(e)}")
+                return jsonify({'error': f'Failed to clean up {collection_name}: {str(e)}'}), 500
         else:
             logger.warning("Weaviate client is not initialized. Skipping cleanup.")
             return jsonify({'warning': 'Weaviate client not available, no cleanup performed'}), 200
@@ -1060,11 +1509,41 @@ def logout_user():
         logger.error(f"Unexpected error during logout cleanup for user_id {user_id}: {str(e)}", exc_info=True)
         return jsonify({'error': f'Failed to clean up on logout: {str(e)}'}), 500
 
+# Admin route for cache hit/miss counters
+@app.route('/api/cache-stats', methods=['GET'])
+@token_required
+@requires("mongo")
+def cache_stats():
+    if not request.is_admin:
+        return jsonify({'error': 'Unauthorized: Admin access required'}), 403
+    return jsonify({'caches': all_cache_stats()}), 200
+
+# Liveness probe: the process is up and serving requests. A required subsystem that
+# failed for good fails it, so the orchestrator restarts the process.
+@app.route('/healthz')
+def healthz():
+    failed = readiness.failed_required()
+    if failed:
+        return jsonify({'status': 'failed', 'failed': failed}), 503
+    return jsonify({'status': 'ok'}), 200
+
+# Readiness probe: per-subsystem initialization state
+@app.route('/readyz')
+def readyz():
+    ready, subsystems = readiness.report()
+    return jsonify({'ready': ready, 'subsystems': subsystems}), 200 if ready else 503
+
 # Test route
 @app.route('/')
 def home():
     return "Medical Bot Backend is running!"
 
+# Start background initialization of the heavy subsystems. Spawned pool processes
+# (report extraction, PDF pages) re-import this module as __mp_main__ and only need
+# report_extract/pdf_extract, so they skip it.
+if __name__ != '__mp_main__':
+    readiness.start_all()
+
 if __name__ == '__main__':
     try:
         debug = os.getenv("FLASK_ENV", "development") == "development"
@@ -0,0 +1,226 @@
+import re
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Disk puts between size checks; the table may exceed db_maxsize by about this many rows
+DB_EVICT_INTERVAL = 64
+
+# Every cache registers itself here so their stats can be reported together
+_registry = {}
+
+class LRUCache:
+    def __init__(self, name, maxsize=1024, db_path=None, db_maxsize=None):
+        """Bounded in-memory LRU, optionally backed by a SQLite file that survives restarts."""
+        self.name = name
+        self.maxsize = maxsize
+        self.db_maxsize = db_maxsize or maxsize * 10
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._disk_puts = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self._table = "cache_" + re.sub(r"\W", "_", name)
+        if db_path:
+            try:
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(f"CREATE TABLE IF NOT EXISTS {self._table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed REAL NOT NULL)")
+                self._db.commit()
+                logger.info(f"Cache {name} backed by {db_path}")
+            except sqlite3.Error as e:
+                logger.error(f"Failed to open cache database {db_path}: {str(e)}. Using memory only.")
+                self._db = None
+        _registry[name] = self
+
+    def _get_from_disk(self, key):
+        try:
+            row = self._db.execute(f"SELECT value FROM {self._table} WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._db.execute(f"UPDATE {self._table} SET accessed = ? WHERE key = ?", (time.time(), key))
+                self._db.commit()
+                return json.loads(row[0])
+        except sqlite3.Error as e:
+            logger.warning(f"Cache {self.name} disk read failed: {str(e)}")
+        return None
+
+    def _put_to_disk(self, items):
+        try:
+            now = time.time()
+            self._db.executemany(f"INSERT OR REPLACE INTO {self._table} (key, value, accessed) VALUES (?, ?, ?)",
+                                 [(key, json.dumps(value), now) for key, value in items])
+            self._disk_puts += 1
+            if self._disk_puts % DB_EVICT_INTERVAL == 0:
+                self._evict_from_disk()
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Cache {self.name} disk write failed: {str(e)}")
+
+    def _evict_from_disk(self):
+        """Delete the least recently accessed rows beyond db_maxsize (runs every DB_EVICT_INTERVAL puts)."""
+        count = self._db.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+        if count > self.db_maxsize:
+            self._db.execute(f"DELETE FROM {self._table} WHERE rowid IN (SELECT rowid FROM {self._table} ORDER BY accessed ASC LIMIT ?)",
+                             (count - self.db_maxsize,))
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            if self._db:
+                value = self._get_from_disk(key)
+                if value is not None:
+                    self._remember(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Store a JSON-serializable value under key."""
+        with self._lock:
+            self._remember(key, value)
+            if self._db:
+                self._put_to_disk([(key, value)])
+
+    def put_many(self, items):
+        """Store several (key, value) pairs with a single disk transaction."""
+        items = list(items)
+        with self._lock:
+            for key, value in items:
+                self._remember(key, value)
+            if self._db and items:
+                self._put_to_disk(items)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db:
+                try:
+                    self._db.execute(f"DELETE FROM {self._table}")
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Cache {self.name} disk clear failed: {str(e)}")
+
+    def stats(self):
+        """Hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "persistent": self._db is not None
+            }
+
+class SemanticAnswerCache:
+    def __init__(self, name, threshold=0.92, ttl=3600, maxsize=1000):
+        """Answers keyed by query embedding: a lookup hits when a stored query in the same
+        scope has cosine similarity >= threshold and has not expired. LRU-bounded to maxsize."""
+        self.name = name
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._entries = OrderedDict()  # entry id -> (scope, unit vector, value, expires_at)
+        self._scopes = {}  # scope -> set of entry ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    @staticmethod
+    def _unit(vector):
+        import numpy as np
+
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, entry_id):
+        scope = self._entries.pop(entry_id)[0]
+        ids = self._scopes.get(scope)
+        if ids is not None:
+            ids.discard(entry_id)
+            if not ids:
+                del self._scopes[scope]
+
+    def get(self, scope, vector):
+        """Return the value of the most similar live entry in scope, or None."""
+        import numpy as np
+
+        query = self._unit(vector)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id in list(self._scopes.get(scope, ())):
+                _, unit, _, expires_at = self._entries[entry_id]
+                if expires_at <= now:
+                    self._drop(entry_id)
+                    self.expired += 1
+                    continue
+                score = float(np.dot(query, unit))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            logger.debug(f"Semantic cache {self.name} hit (similarity {best_score:.3f})")
+            return self._entries[best_id][2]
+
+    def put(self, scope, vector, value):
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (scope, self._unit(vector), value, time.monotonic() + self.ttl)
+            self._scopes.setdefault(scope, set()).add(entry_id)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "threshold": self.threshold,
+                "ttl": self.ttl
+            }
+
+def all_cache_stats():
+    """Stats for every cache created in this process, keyed by cache name."""
+    return {name: cache.stats() for name, cache in _registry.items()}
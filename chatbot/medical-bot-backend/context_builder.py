@@ -0,0 +1,85 @@
+import os
+import re
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Prompt tokens allowed for the retrieved documents plus user history and question
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+# Gemini averages roughly four characters per token on English text; counting locally
+# avoids a count_tokens round trip per chunk
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "4"))
+# Chunks sharing at least this fraction of the smaller one's word shingles are duplicates
+DUPLICATE_OVERLAP = float(os.getenv("CONTEXT_DUPLICATE_OVERLAP", "0.6"))
+SHINGLE_SIZE = 8
+# A partial last document is only worth including if this many tokens fit
+MIN_PARTIAL_TOKENS = 64
+
+def count_tokens(text):
+    """Estimated Gemini token count of text."""
+    return int(len(text) / CHARS_PER_TOKEN) + 1 if text else 0
+
+def document_score(document, rank):
+    """Similarity of a retrieved document: 1 - distance when Weaviate returned one, else by rank."""
+    distance = (document.metadata or {}).get("_additional", {}).get("distance")
+    return 1.0 - float(distance) if distance is not None else -float(rank)
+
+def _shingles(text):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def _truncate(text, max_tokens):
+    """Cut text at a word boundary to about max_tokens."""
+    cut = text[:int(max_tokens * CHARS_PER_TOKEN)]
+    return cut[:cut.rfind(' ')] if ' ' in cut else cut
+
+def build_context(documents, budget=CONTEXT_TOKEN_BUDGET, reserved_text=()):
+    """Rank documents by similarity, drop overlapping ones and pack them into the token budget.
+
+    reserved_text (user history, question, ...) is counted against the budget first.
+    Returns (packed documents in score order, stats dict).
+    """
+    from langchain.schema import Document
+
+    available = budget - sum(count_tokens(text) for text in reserved_text)
+    ranked = sorted(enumerate(documents), key=lambda item: document_score(item[1], item[0]), reverse=True)
+
+    packed = []
+    kept_shingles = []
+    duplicates = 0
+    truncated = 0
+    used = 0
+    for _, document in ranked:
+        text = document.page_content or ""
+        shingles = _shingles(text)
+        if any(len(shingles & kept) >= DUPLICATE_OVERLAP * min(len(shingles), len(kept)) for kept in kept_shingles):
+            duplicates += 1
+            continue
+        tokens = count_tokens(text)
+        if used + tokens > available:
+            remaining = available - used
+            if remaining < MIN_PARTIAL_TOKENS:
+                break
+            document = Document(page_content=_truncate(text, remaining), metadata=document.metadata)
+            tokens = count_tokens(document.page_content)
+            truncated += 1
+        packed.append(document)
+        kept_shingles.append(shingles)
+        used += tokens
+
+    stats = {
+        "candidates": len(documents),
+        "packed": len(packed),
+        "duplicates": duplicates,
+        "truncated": truncated,
+        "document_tokens": used,
+        "budget": budget,
+        "available": available
+    }
+    logger.info(f"Context: packed {len(packed)}/{len(documents)} documents into {used}/{max(available, 0)} tokens "
+                f"({duplicates} duplicates, {truncated} truncated)")
+    return packed, stats
@@ -0,0 +1,80 @@
+import os
+import hashlib
+import logging
+import threading
+from langchain_core.embeddings import Embeddings
+from cache import LRUCache
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EMBEDDING_MODEL = "models/embedding-001"
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_DB = os.getenv("EMBEDDING_CACHE_DB", os.path.join(BASE_DIR, "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_DB_SIZE = int(os.getenv("EMBEDDING_CACHE_DB_SIZE", "500000"))
+
+# Process-wide cache shared by the LangChain wrapper and the genai helper
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_embedding_cache():
+    """Return the shared embedding cache (memory LRU in front of SQLite)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LRUCache("embeddings", maxsize=EMBEDDING_CACHE_SIZE,
+                                  db_path=EMBEDDING_CACHE_DB or None, db_maxsize=EMBEDDING_CACHE_DB_SIZE)
+    return _cache
+
+def embedding_key(model, task_type, text):
+    """Content-addressed key: (model, task_type, sha256(text))."""
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    return f"{model}|{(task_type or '').lower()}|{digest}"
+
+def cached_embed(texts, model, task_type, embed_missing):
+    """Return one embedding per text, calling embed_missing(list_of_texts) only for cache misses."""
+    cache = get_embedding_cache()
+    keys = [embedding_key(model, task_type, text) for text in texts]
+    vectors = [cache.get(key) for key in keys]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        # Identical texts in one call are embedded once
+        unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+        new_vectors = dict(zip(unique_texts, embed_missing(unique_texts)))
+        for i in missing:
+            vectors[i] = list(new_vectors[texts[i]])
+        cache.put_many((embedding_key(model, task_type, text), list(vector)) for text, vector in new_vectors.items())
+    logger.debug(f"Embedding cache: {len(texts) - len(missing)}/{len(texts)} hits for {task_type}")
+    return vectors
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings, model=EMBEDDING_MODEL):
+        """Wrap a LangChain embeddings object (e.g. GoogleGenerativeAIEmbeddings) with the shared cache."""
+        self.embeddings = embeddings
+        self.model = model
+
+    def embed_documents(self, texts):
+        return cached_embed(list(texts), self.model, "retrieval_document", self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        return cached_embed([text], self.model, "retrieval_query",
+                            lambda missing: [self.embeddings.embed_query(missing[0])])[0]
+
+def cached_embed_content(model, content, task_type, before_request=None, **kwargs):
+    """Drop-in for genai.embed_content that serves repeated texts from the shared cache.
+
+    before_request() (e.g. a rate limiter) runs only when cache misses need an API call.
+    """
+    import google.generativeai as genai
+
+    def embed_missing(missing):
+        if before_request:
+            before_request()
+        return genai.embed_content(model=model, content=missing, task_type=task_type, **kwargs)['embedding']
+
+    texts = [content] if isinstance(content, str) else list(content)
+    vectors = cached_embed(texts, model, task_type, embed_missing)
+    return {'embedding': vectors[0] if isinstance(content, str) else vectors}
@@ -0,0 +1,235 @@
+import os
+import logging
+import threading
+import time
+import queue
+from concurrent.futures import Future
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Model location (override with FOOD_MODEL_PATH)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.getenv("FOOD_MODEL_PATH", os.path.join(BASE_DIR, "model", "final_v1_xception_savedmodel"))
+IMAGE_SIZE = (224, 224)
+TOP_K = 5
+
+# Inference backend: "savedmodel" (full precision) or "tflite" (quantized, XNNPACK on CPU)
+MODEL_BACKEND = os.getenv("FOOD_MODEL_BACKEND", "savedmodel").lower()
+TFLITE_MODEL_PATH = os.getenv("FOOD_TFLITE_MODEL_PATH", os.path.join(BASE_DIR, "model", "final_v1_xception_int8.tflite"))
+TFLITE_NUM_THREADS = int(os.getenv("FOOD_TFLITE_NUM_THREADS", str(os.cpu_count() or 1)))
+
+# Micro-batching of concurrent requests (FOOD_BATCH_MAX_SIZE=1 disables it)
+BATCH_MAX_SIZE = int(os.getenv("FOOD_BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("FOOD_BATCH_MAX_WAIT_MS", "5"))
+
+# Class labels
+CLASS_LABELS = [
+    'Aloo_matar', 'Besan_cheela', 'Biryani', 'Chapathi', 'Chole_bature',
+    'Dahl', 'Dhokla', 'Dosa', 'Gulab_jamun', 'Idli',
+    'Jalebi', 'Kadai_paneer', 'Naan', 'Paani_puri', 'Pakoda',
+    'Pav_bhaji', 'Poha', 'Rolls', 'Samosa', 'Vada_pav'
+]
+
+# Preprocessing
+def preprocess_image_manual(image_path, target_size=IMAGE_SIZE):
+    """Load an image from disk as a normalized (1, 224, 224, 3) batch."""
+    # TensorFlow is imported lazily so processes that only talk to the inference server never load it
+    from tensorflow.keras.preprocessing.image import load_img, img_to_array
+    img = load_img(image_path, target_size=target_size)
+    img_array = img_to_array(img)
+    img_array = np.expand_dims(img_array, axis=0)
+    img_array = img_array / 255.0
+    return img_array
+
+class InferenceBatcher:
+    def __init__(self, predict_batch, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS):
+        """Collect concurrent requests for up to max_wait_ms and run them as one forward pass."""
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="food-inference-batcher", daemon=True)
+        self._worker.start()
+        logger.info(f"Inference batcher started (max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms})")
+
+    def submit(self, images):
+        """Queue a (N, 224, 224, 3) array and return a Future resolving to its (N, classes) predictions."""
+        future = Future()
+        self._queue.put((images, future))
+        return future
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch is full or the wait expires."""
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                images = np.concatenate([images for images, _ in batch], axis=0)
+                start = time.time()
+                predictions = self.predict_batch(images)
+                logger.debug(f"Ran batched inference for {len(batch)} requests ({len(images)} images) in {time.time() - start:.3f}s")
+            except Exception as e:
+                logger.error(f"Batched inference failed: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for images, future in batch:
+                future.set_result(predictions[offset:offset + len(images)])
+                offset += len(images)
+
+class SavedModelBackend:
+    name = "savedmodel"
+
+    def __init__(self, model_path=MODEL_PATH):
+        """Load the full-precision Xception SavedModel."""
+        from tensorflow.keras.layers import TFSMLayer
+        self.model_path = model_path
+        self.model = TFSMLayer(model_path, call_endpoint='serving_default')
+
+    def predict_batch(self, batch):
+        outputs = self.model(batch, training=False)
+        return list(outputs.values())[0].numpy()
+
+class TFLiteBackend:
+    name = "tflite"
+
+    def __init__(self, model_path=TFLITE_MODEL_PATH, num_threads=TFLITE_NUM_THREADS):
+        """Load a converted (int8/float16) TFLite model; XNNPACK is the default CPU delegate."""
+        import tensorflow as tf
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"TFLite model not found at {model_path}. Run 'python food_model_tools.py convert' first.")
+        self.model_path = model_path
+        self.interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self.input_detail['shape'][0])
+        # The interpreter is not thread-safe
+        self._lock = threading.Lock()
+
+    def _resize(self, batch_size):
+        if batch_size != self._batch_size:
+            self.interpreter.resize_tensor_input(self.input_detail['index'], [batch_size, *IMAGE_SIZE, 3])
+            self.interpreter.allocate_tensors()
+            self.input_detail = self.interpreter.get_input_details()[0]
+            self.output_detail = self.interpreter.get_output_details()[0]
+            self._batch_size = batch_size
+
+    def predict_batch(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            self._resize(len(batch))
+            input_dtype = self.input_detail['dtype']
+            if input_dtype in (np.int8, np.uint8):
+                scale, zero_point = self.input_detail['quantization']
+                batch = np.clip(np.round(batch / scale + zero_point), np.iinfo(input_dtype).min, np.iinfo(input_dtype).max).astype(input_dtype)
+            self.interpreter.set_tensor(self.input_detail['index'], batch)
+            self.interpreter.invoke()
+            predictions = self.interpreter.get_tensor(self.output_detail['index'])
+            if self.output_detail['dtype'] in (np.int8, np.uint8):
+                scale, zero_point = self.output_detail['quantization']
+                predictions = (predictions.astype(np.float32) - zero_point) * scale
+        return predictions
+
+BACKENDS = {
+    SavedModelBackend.name: SavedModelBackend,
+    TFLiteBackend.name: TFLiteBackend
+}
+
+def load_backend(name=MODEL_BACKEND):
+    """Instantiate the configured inference backend."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown food model backend '{name}'. Use one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+class FoodClassifier:
+    def __init__(self, backend=None, class_labels=None, top_k=TOP_K):
+        """Load the food model once and keep it for the lifetime of the process."""
+        start = time.time()
+        self.backend = backend or load_backend()
+        self.class_labels = class_labels or CLASS_LABELS
+        self.top_k = top_k
+        self.batcher = None
+        logger.info(f"Food classifier ({self.backend.name}) loaded from {self.backend.model_path} in {time.time() - start:.2f}s")
+
+    def warm_up(self):
+        """Run one dummy forward pass so the first real request does not pay graph tracing."""
+        start = time.time()
+        self.predict_batch(np.zeros((1, *IMAGE_SIZE, 3), dtype=np.float32))
+        logger.info(f"Food classifier warm-up completed in {time.time() - start:.2f}s")
+
+    def predict_batch(self, batch):
+        """Run one forward pass over a (N, 224, 224, 3) batch and return the (N, classes) probabilities."""
+        return self.backend.predict_batch(batch)
+
+    def enable_batching(self, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS):
+        """Route predictions through a shared micro-batching queue."""
+        self.batcher = InferenceBatcher(self.predict_batch, max_batch_size, max_wait_ms)
+
+    def classify(self, images):
+        """Return probabilities for a batch, going through the batcher when it is enabled."""
+        if self.batcher:
+            return self.batcher.submit(images).result()
+        return self.predict_batch(images)
+
+    def decode(self, probabilities, top_k=None):
+        """Turn one row of probabilities into (label, confidence, top_k) with confidences in percent."""
+        top_k = top_k or self.top_k
+        predicted_class_index = int(np.argmax(probabilities))
+        predicted_class_label = self.class_labels[predicted_class_index]
+        confidence = float(probabilities[predicted_class_index]) * 100
+        top_indices = np.argsort(probabilities)[-top_k:][::-1]
+        top_predictions = [(self.class_labels[idx], float(probabilities[idx]) * 100) for idx in top_indices]
+        return predicted_class_label, confidence, top_predictions
+
+    def predict(self, image, top_k=None):
+        """Classify an image path or a preprocessed array and return (label, confidence, top_k)."""
+        if isinstance(image, str):
+            image = preprocess_image_manual(image)
+        image = np.asarray(image, dtype=np.float32)
+        if image.ndim == 3:
+            image = np.expand_dims(image, axis=0)
+        predictions = self.classify(image)
+        return self.decode(predictions[0], top_k)
+
+    def predict_many(self, images, top_k=None):
+        """Classify several preprocessed images in one forward pass and return a (label, confidence, top_k) per image."""
+        batch = np.concatenate([np.asarray(image, dtype=np.float32).reshape(-1, *IMAGE_SIZE, 3) for image in images], axis=0)
+        predictions = self.classify(batch)
+        return [self.decode(row, top_k) for row in predictions]
+
+# Process-wide classifier instance
+_classifier = None
+_classifier_lock = threading.Lock()
+
+def get_food_classifier():
+    """Return the shared classifier, loading and warming it up on first use."""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                classifier = FoodClassifier()
+                classifier.warm_up()
+                if BATCH_MAX_SIZE > 1:
+                    classifier.enable_batching()
+                _classifier = classifier
+    return _classifier
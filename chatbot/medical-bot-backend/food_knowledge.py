@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class FoodKnowledgeIndex:
+    def __init__(self, client, embeddings, labels, collection="food_analyse", k=3, min_refresh_interval=300):
+        """Precomputed label -> food_analyse documents for the fixed set of classifier labels."""
+        self.client = client
+        self.embeddings = embeddings
+        self.labels = list(labels)
+        self.collection = collection
+        self.k = k
+        self.min_refresh_interval = min_refresh_interval
+        self.ready = False
+        self.last_built = 0.0
+        self._entries = {}
+        self._label_vectors = {}
+        self._stale = False
+        self._refreshing = False
+        self._build_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+
+    def _count(self):
+        response = self.client.query.aggregate(self.collection).with_meta_count().do()
+        return response.get("data", {}).get("Aggregate", {}).get(self.collection, [{}])[0].get("meta", {}).get("count", 0)
+
+    def build(self):
+        """Query food_analyse once per label and swap in the new index."""
+        from langchain_community.vectorstores import Weaviate
+
+        with self._build_lock:
+            start = time.time()
+            entries = {}
+            if self.client and self.client.schema.exists(self.collection) and self._count() > 0:
+                vector_store = Weaviate(
+                    client=self.client,
+                    index_name=self.collection,
+                    text_key="text",
+                    embedding=self.embeddings,
+                    by_text=False
+                )
+                for label in self.labels:
+                    # Labels never change, so each one is embedded only once per process
+                    if label not in self._label_vectors:
+                        self._label_vectors[label] = self.embeddings.embed_query(label)
+                    entries[label] = vector_store.similarity_search_by_vector(self._label_vectors[label], k=self.k)
+            else:
+                logger.warning(f"{self.collection} is empty or unavailable. Food knowledge index is empty.")
+                entries = {label: [] for label in self.labels}
+            self._entries = entries
+            self.last_built = time.time()
+            self.ready = True
+            with self._state_lock:
+                self._stale = False
+            logger.info(f"Built food knowledge index for {len(entries)} labels in {time.time() - start:.2f}s")
+
+    def _build_in_background(self):
+        try:
+            self.build()
+        except Exception as e:
+            logger.error(f"Failed to build food knowledge index: {str(e)}")
+        finally:
+            with self._state_lock:
+                self._refreshing = False
+
+    def refresh_async(self):
+        """Rebuild the index on a background thread unless a rebuild is already running."""
+        if self.embeddings is None:
+            # Not configured yet; the startup build will pick up the change
+            return
+        with self._state_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._build_in_background, name="food-knowledge-refresh", daemon=True).start()
+
+    def mark_stale(self):
+        """Note that food_analyse changed; rebuild now if the last build is old enough."""
+        with self._state_lock:
+            self._stale = True
+        if time.time() - self.last_built >= self.min_refresh_interval:
+            self.refresh_async()
+
+    def lookup(self, label):
+        """Return the precomputed documents for label, or None if the index cannot answer."""
+        if not self.ready:
+            return None
+        if self._stale and time.time() - self.last_built >= self.min_refresh_interval:
+            self.refresh_async()
+        return self._entries.get(label)
@@ -0,0 +1,178 @@
+import os
+import argparse
+import logging
+import time
+import resource
+import queue
+import multiprocessing
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# How long one backend may run (load + warmup + all images) before it counts as failed
+BENCHMARK_TIMEOUT_SECONDS = float(os.getenv("FOOD_BENCHMARK_TIMEOUT_SECONDS", "1800"))
+
+def list_images(image_dir, limit=None):
+    """Return the image files under image_dir (recursively), sorted for reproducible runs."""
+    paths = []
+    for root, _, files in os.walk(image_dir):
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    paths.sort()
+    return paths[:limit] if limit else paths
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# Step 1: Convert the SavedModel to a quantized TFLite model
+def convert(saved_model_path, output_path, mode, calibration_dir=None, calibration_steps=100):
+    """Convert the Xception SavedModel to TFLite with int8, float16 or dynamic-range quantization."""
+    import tensorflow as tf
+    from food_classifier import preprocess_image_manual
+
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_path)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == "int8":
+        if not calibration_dir:
+            raise ValueError("int8 conversion needs --calibration-dir with representative food images")
+        calibration_images = list_images(calibration_dir, calibration_steps)
+        if not calibration_images:
+            raise ValueError(f"No calibration images found in {calibration_dir}")
+
+        def representative_dataset():
+            for image_path in calibration_images:
+                yield [preprocess_image_manual(image_path).astype(np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        logger.info(f"Calibrating int8 quantization with {len(calibration_images)} images")
+    elif mode != "dynamic":
+        raise ValueError(f"Unknown quantization mode '{mode}'")
+
+    start = time.time()
+    tflite_model = converter.convert()
+    with open(output_path, "wb") as f:
+        f.write(tflite_model)
+    logger.info(f"Wrote {mode} TFLite model to {output_path} ({len(tflite_model) / 1024 / 1024:.1f} MB) in {time.time() - start:.1f}s")
+
+# Step 2: Benchmark a backend in its own process so memory figures are not mixed
+def _benchmark_worker(backend_name, image_paths, warmup, results):
+    from food_classifier import load_backend, preprocess_image_manual
+
+    rss_before = peak_rss_mb()
+    backend = load_backend(backend_name)
+    for _ in range(warmup):
+        backend.predict_batch(np.zeros((1, 224, 224, 3), dtype=np.float32))
+
+    top1 = []
+    latencies = []
+    for image_path in image_paths:
+        image = preprocess_image_manual(image_path)
+        start = time.perf_counter()
+        predictions = backend.predict_batch(image)
+        latencies.append((time.perf_counter() - start) * 1000)
+        top1.append(int(np.argmax(predictions[0])))
+    results.put({
+        "backend": backend_name,
+        "top1": top1,
+        "latencies_ms": latencies,
+        "rss_mb": peak_rss_mb(),
+        "model_rss_mb": peak_rss_mb() - rss_before
+    })
+
+def default_output_path(mode):
+    """model/final_v1_xception_<mode>.tflite next to the SavedModel."""
+    from food_classifier import BASE_DIR
+
+    return os.path.join(BASE_DIR, "model", f"final_v1_xception_{mode}.tflite")
+
+def _collect_result(worker, results, timeout=BENCHMARK_TIMEOUT_SECONDS):
+    """Wait for the worker's report; return None if it exits without one or runs past timeout."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return results.get(timeout=1)
+        except queue.Empty:
+            if not worker.is_alive():
+                # It may have put its report just before exiting
+                try:
+                    return results.get(timeout=1)
+                except queue.Empty:
+                    return None
+    worker.terminate()
+    return None
+
+def benchmark(image_dir, backends, limit=None, warmup=3):
+    """Report top-1 agreement with the SavedModel, per-image latency and resident memory for each backend."""
+    image_paths = list_images(image_dir, limit)
+    if not image_paths:
+        raise ValueError(f"No images found in {image_dir}")
+    if "savedmodel" not in backends:
+        backends = ["savedmodel"] + list(backends)
+
+    ctx = multiprocessing.get_context("spawn")
+    reports = {}
+    failed = {}
+    for backend_name in backends:
+        results = ctx.Queue()
+        worker = ctx.Process(target=_benchmark_worker, args=(backend_name, image_paths, warmup, results))
+        worker.start()
+        report = _collect_result(worker, results)
+        worker.join()
+        if report is None:
+            failed[backend_name] = f"worker exited with code {worker.exitcode} without a result"
+            logger.error(f"Benchmark of {backend_name} failed: {failed[backend_name]}")
+        else:
+            reports[backend_name] = report
+
+    if "savedmodel" not in reports:
+        raise RuntimeError(f"The savedmodel reference benchmark failed: {failed.get('savedmodel')}")
+    reference = np.array(reports["savedmodel"]["top1"])
+    print(f"\nBenchmark over {len(image_paths)} images")
+    print(f"{'backend':<12}{'top-1 agree':>12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'peak RSS MB':>13}{'model MB':>10}")
+    for backend_name in backends:
+        if backend_name in failed:
+            print(f"{backend_name:<12}  FAILED: {failed[backend_name]}")
+            continue
+        report = reports[backend_name]
+        latencies = np.array(report["latencies_ms"])
+        agreement = float(np.mean(np.array(report["top1"]) == reference)) * 100
+        print(f"{backend_name:<12}{agreement:>11.2f}%{latencies.mean():>10.1f}{np.percentile(latencies, 50):>10.1f}"
+              f"{np.percentile(latencies, 95):>10.1f}{report['rss_mb']:>13.0f}{report['model_rss_mb']:>10.0f}")
+    return reports
+
+def main():
+    from food_classifier import MODEL_PATH, BACKENDS
+
+    parser = argparse.ArgumentParser(description="Convert and benchmark the food classifier backends.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="Convert the SavedModel to a quantized TFLite model")
+    convert_parser.add_argument("--saved-model", default=MODEL_PATH)
+    convert_parser.add_argument("--output", help="Defaults to model/final_v1_xception_<mode>.tflite")
+    convert_parser.add_argument("--mode", choices=["int8", "float16", "dynamic"], default="int8")
+    convert_parser.add_argument("--calibration-dir", help="Representative food images for int8 calibration")
+    convert_parser.add_argument("--calibration-steps", type=int, default=100)
+
+    benchmark_parser = subparsers.add_parser("benchmark", help="Compare backends on a folder of food images")
+    benchmark_parser.add_argument("--images", required=True, help="Folder of evaluation images")
+    benchmark_parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    benchmark_parser.add_argument("--limit", type=int)
+    benchmark_parser.add_argument("--warmup", type=int, default=3)
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        convert(args.saved_model, args.output or default_output_path(args.mode), args.mode,
+                args.calibration_dir, args.calibration_steps)
+    else:
+        benchmark(args.images, args.backends, args.limit, args.warmup)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import os
+import io
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+import numpy as np
+from PIL import Image
+from food_classifier import IMAGE_SIZE, preprocess_image_manual
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def read_upload(file):
+    """Read an uploaded werkzeug FileStorage into bytes without touching the disk."""
+    file.stream.seek(0)
+    return file.stream.read()
+
+def decode_image(data, mode="RGB"):
+    """Decode raw image bytes into a PIL image in the given mode."""
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    return img.convert(mode)
+
+def decode_image_for_classifier(data, target_size=IMAGE_SIZE):
+    """Decode bytes straight into a normalized (1, 224, 224, 3) float32 batch."""
+    # Nearest-neighbour resize matches keras load_img, so predictions match the file-based path
+    img = decode_image(data).resize(target_size, Image.NEAREST)
+    img_array = np.asarray(img, dtype=np.float32) / 255.0
+    return np.expand_dims(img_array, axis=0)
+
+def decode_image_for_ocr(data):
+    """Decode bytes into the uint8 BGR array PaddleOCR expects (same layout as cv2.imread)."""
+    img = decode_image(data)
+    return np.ascontiguousarray(np.asarray(img, dtype=np.uint8)[:, :, ::-1])
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II basis as an (n, n) matrix."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+_DCT_32 = _dct_matrix(32)
+
+def perceptual_hash(image, hash_size=8):
+    """64-bit pHash (hex) of a preprocessed classifier image, stable across re-encodes of the same picture."""
+    img = np.asarray(image, dtype=np.float32).reshape(*IMAGE_SIZE, 3)
+    gray = img @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    # 224 = 32 * 7, so a mean pool gives the 32x32 thumbnail without another resize
+    pool = IMAGE_SIZE[0] // 32
+    thumb = gray.reshape(32, pool, 32, pool).mean(axis=(1, 3))
+    low = (_DCT_32 @ thumb @ _DCT_32.T)[:hash_size, :hash_size].flatten()
+    bits = low > np.median(low)
+    return f"{int(''.join('1' if bit else '0' for bit in bits), 2):0{hash_size * hash_size // 4}x}"
+
+@contextmanager
+def temp_upload_file(data, filename=""):
+    """Write bytes to a uniquely named temporary file and always remove it afterwards."""
+    suffix = os.path.splitext(filename)[1] if filename else ""
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Failed to remove temporary file {path}: {str(e)}")
+
+def load_classifier_input(data, filename=""):
+    """Preprocess image bytes for the classifier, falling back to the file-based loader."""
+    try:
+        return decode_image_for_classifier(data)
+    except Exception as e:
+        logger.warning(f"In-memory decode failed for {filename}: {str(e)}. Falling back to temporary file.")
+        with temp_upload_file(data, filename) as image_path:
+            return preprocess_image_manual(image_path)
+
+class LockedOCR:
+    def __init__(self, engine):
+        """A PaddleOCR engine shared by threads; PaddleOCR is not thread-safe, so calls take turns."""
+        self.engine = engine
+        self._lock = threading.Lock()
+
+    def ocr(self, *args, **kwargs):
+        with self._lock:
+            return self.engine.ocr(*args, **kwargs)
+
+def ocr_text(result):
+    """Join the recognized lines of a PaddleOCR result."""
+    return "\n".join([line[1][0] for line in (result[0] or []) if line]) if result else ""
+
+def ocr_image_bytes(ocr, data, filename=""):
+    """Run PaddleOCR on image bytes, falling back to a temporary file if decoding fails."""
+    try:
+        image = decode_image_for_ocr(data)
+    except Exception as e:
+        logger.warning(f"In-memory decode failed for {filename}: {str(e)}. Falling back to temporary file.")
+        with temp_upload_file(data, filename) as image_path:
+            return ocr.ocr(image_path, cls=True)
+    return ocr.ocr(image, cls=True)
@@ -0,0 +1,84 @@
+import os
+import logging
+import threading
+from multiprocessing.connection import Client
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Shared secret for the (pickle-based) connection; required, there is no default
+INFERENCE_AUTHKEY = os.getenv("INFERENCE_AUTHKEY", "").encode('utf-8') or None
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "60"))
+
+class InferenceClient:
+    def __init__(self, socket_path, authkey=INFERENCE_AUTHKEY, timeout=INFERENCE_TIMEOUT):
+        """Thin client for inference_server.py; keeps one connection per thread."""
+        if not authkey:
+            raise ValueError("INFERENCE_AUTHKEY must be set when INFERENCE_SOCKET is used")
+        self.socket_path = socket_path
+        self.authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.socket_path, family='AF_UNIX', authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def call(self, op, **kwargs):
+        """Send one request and wait for its result, reconnecting once if the server restarted."""
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send({"op": op, "kwargs": kwargs})
+                answered = conn.poll(self.timeout)
+                if answered:
+                    response = conn.recv()
+            except (EOFError, OSError) as e:
+                self._reset()
+                if attempt == 1:
+                    raise ConnectionError(f"Inference server at {self.socket_path} unavailable: {str(e)}")
+                logger.warning(f"Inference connection lost ({str(e)}). Reconnecting...")
+                continue
+            if not answered:
+                # The server is still working on it; resending would run the op twice
+                self._reset()
+                raise TimeoutError(f"Inference server did not answer {op} within {self.timeout}s")
+            break
+        if not response["ok"]:
+            raise RuntimeError(f"Inference server error: {response['error']}")
+        return response["result"]
+
+    def ping(self):
+        return self.call("ping") == "pong"
+
+class RemoteFoodClassifier:
+    def __init__(self, client):
+        """Same predict/predict_many API as FoodClassifier, served by the inference server."""
+        self.client = client
+
+    def predict_many(self, images, top_k=None):
+        return self.client.call("classify", images=list(images), top_k=top_k)
+
+    def predict(self, image, top_k=None):
+        return self.predict_many([image], top_k)[0]
+
+class RemoteOCR:
+    def __init__(self, client):
+        """Same ocr() API as PaddleOCR, served by the inference server."""
+        self.client = client
+
+    def ocr(self, image, cls=True):
+        return self.client.call("ocr", image=image, cls=cls)
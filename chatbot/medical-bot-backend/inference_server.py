@@ -0,0 +1,92 @@
+import os
+import argparse
+import logging
+import threading
+import time
+from multiprocessing.connection import Listener
+from multiprocessing import AuthenticationError
+from dotenv import load_dotenv
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "/tmp/medical-bot-inference.sock")
+# Shared secret for the (pickle-based) connection; required, there is no default
+INFERENCE_AUTHKEY = os.getenv("INFERENCE_AUTHKEY", "").encode('utf-8') or None
+
+class InferenceServer:
+    def __init__(self, socket_path=INFERENCE_SOCKET, authkey=INFERENCE_AUTHKEY):
+        """Host the food classifier and the OCR engine once for every web worker on the node."""
+        from food_classifier import get_food_classifier
+        from paddleocr import PaddleOCR
+
+        self.socket_path = socket_path
+        self.authkey = authkey
+        self.classifier = get_food_classifier()
+        self.ocr_engine = PaddleOCR(use_angle_cls=True, lang='en', use_gpu=False)
+        # PaddleOCR predictors are not thread-safe; the classifier batches concurrent calls itself
+        self._ocr_lock = threading.Lock()
+        self.handlers = {
+            "ping": lambda: "pong",
+            "classify": self.classify,
+            "ocr": self.ocr
+        }
+
+    def classify(self, images, top_k=None):
+        return self.classifier.predict_many(images, top_k)
+
+    def ocr(self, image, cls=True):
+        with self._ocr_lock:
+            return self.ocr_engine.ocr(image, cls=cls)
+
+    def handle_connection(self, conn):
+        """Serve requests from one client connection until it closes."""
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except EOFError:
+                    break
+                start = time.time()
+                op = request.get("op")
+                try:
+                    if op not in self.handlers:
+                        raise ValueError(f"Unknown operation '{op}'")
+                    result = self.handlers[op](**request.get("kwargs", {}))
+                    conn.send({"ok": True, "result": result})
+                    logger.debug(f"Handled {op} in {time.time() - start:.3f}s")
+                except Exception as e:
+                    logger.error(f"Inference request {op} failed: {str(e)}")
+                    conn.send({"ok": False, "error": str(e)})
+        except (OSError, EOFError) as e:
+            logger.warning(f"Inference client connection dropped: {str(e)}")
+        finally:
+            conn.close()
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        with Listener(self.socket_path, family='AF_UNIX', authkey=self.authkey) as listener:
+            os.chmod(self.socket_path, 0o660)
+            logger.info(f"Inference server listening on {self.socket_path}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except AuthenticationError as e:
+                    logger.warning(f"Rejected inference client: {str(e)}")
+                    continue
+                threading.Thread(target=self.handle_connection, args=(conn,), daemon=True).start()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the shared food-classifier/OCR inference server.")
+    parser.add_argument("--socket", default=INFERENCE_SOCKET, help="Unix socket path")
+    args = parser.parse_args()
+    if not INFERENCE_AUTHKEY:
+        parser.error("INFERENCE_AUTHKEY must be set")
+    InferenceServer(socket_path=args.socket).serve_forever()
+
+if __name__ == "__main__":
+    main()
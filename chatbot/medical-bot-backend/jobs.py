@@ -0,0 +1,90 @@
+import os
+import uuid
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Finished or not, job records are removed by MongoDB's TTL monitor after this long
+JOB_TTL_HOURS = float(os.getenv("JOB_TTL_HOURS", "24"))
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+COMPLETED_WITH_ERRORS = "completed_with_errors"
+FAILED = "failed"
+
+class JobStore:
+    def __init__(self, collection):
+        """Background job records in a MongoDB collection, so any web worker can answer status polls."""
+        self.collection = collection
+        self._indexed = False
+        self._lock = threading.Lock()
+
+    def _ensure_index(self):
+        if self._indexed:
+            return
+        with self._lock:
+            if not self._indexed:
+                try:
+                    self.collection.create_index("expires_at", expireAfterSeconds=0)
+                except Exception as e:
+                    logger.warning(f"Could not create TTL index on jobs: {str(e)}")
+                self._indexed = True
+
+    def create(self, kind, owner, documents=(), **fields):
+        """Insert a queued job with one progress entry per document name; return its id."""
+        self._ensure_index()
+        now = datetime.now(timezone.utc)
+        job_id = uuid.uuid4().hex
+        job = {
+            "_id": job_id,
+            "kind": kind,
+            "owner": str(owner),
+            "status": QUEUED,
+            "documents": [{"name": name, "status": QUEUED} for name in documents],
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": now + timedelta(hours=JOB_TTL_HOURS)
+        }
+        job.update(fields)
+        self.collection.insert_one(job)
+        logger.info(f"Created {kind} job {job_id} for {owner} with {len(job['documents'])} documents")
+        return job_id
+
+    def update(self, job_id, **fields):
+        fields["updated_at"] = datetime.now(timezone.utc)
+        self.collection.update_one({"_id": job_id}, {"$set": fields})
+
+    def update_document(self, job_id, index, **fields):
+        """Update the progress entry of the index-th document of a job."""
+        update = {f"documents.{index}.{key}": value for key, value in fields.items()}
+        update["updated_at"] = datetime.now(timezone.utc)
+        self.collection.update_one({"_id": job_id}, {"$set": update})
+
+    def is_active(self, job_id, max_idle_seconds):
+        """Whether the job is queued or running and was updated within max_idle_seconds."""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_idle_seconds)
+        return self.collection.find_one(
+            {"_id": job_id, "status": {"$in": [QUEUED, RUNNING]}, "updated_at": {"$gte": cutoff}},
+            {"_id": 1}
+        ) is not None
+
+    def delete(self, job_id):
+        self.collection.delete_one({"_id": job_id})
+
+    def get(self, job_id):
+        """Return the job as a JSON-ready dict, or None if it does not exist (or expired)."""
+        job = self.collection.find_one({"_id": job_id}, {"expires_at": 0})
+        if not job:
+            return None
+        job["job_id"] = job.pop("_id")
+        for key in ("created_at", "updated_at"):
+            if job.get(key):
+                job[key] = job[key].isoformat()
+        return job
@@ -0,0 +1,101 @@
+import os
+import logging
+import threading
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-1.5-pro")
+# Gemini calls in flight per process; further callers wait for a slot
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_SLOT_TIMEOUT = float(os.getenv("LLM_SLOT_TIMEOUT", "60"))
+
+_llm_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+class LLMBusyError(RuntimeError):
+    pass
+
+class Limited:
+    def __init__(self, runnable, name):
+        """Wrap a model or chain so every call holds one of the process-wide LLM slots."""
+        self.runnable = runnable
+        self.name = name
+
+    def _acquire(self):
+        if not _llm_slots.acquire(timeout=LLM_SLOT_TIMEOUT):
+            raise LLMBusyError(f"No LLM slot free for {self.name} after {LLM_SLOT_TIMEOUT:.0f}s")
+
+    def invoke(self, *args, **kwargs):
+        self._acquire()
+        try:
+            return self.runnable.invoke(*args, **kwargs)
+        finally:
+            _llm_slots.release()
+
+    def stream(self, *args, **kwargs):
+        """Yield from runnable.stream(), holding the slot until the stream is exhausted or closed."""
+        self._acquire()
+        try:
+            yield from self.runnable.stream(*args, **kwargs)
+        finally:
+            _llm_slots.release()
+
+# Long-lived chat models keyed by (model, temperature); each keeps its client and connections
+_models = {}
+# Prebuilt chains by name, and the functions that build them
+_chains = {}
+_chain_builders = {}
+_lock = threading.RLock()
+
+def get_model(temperature, model=LLM_MODEL):
+    """Return the shared ChatGoogleGenerativeAI for (model, temperature), creating it once."""
+    key = (model, temperature)
+    if key not in _models:
+        with _lock:
+            if key not in _models:
+                from langchain_google_genai import ChatGoogleGenerativeAI
+
+                _models[key] = ChatGoogleGenerativeAI(model=model, temperature=temperature,
+                                                      google_api_key=os.getenv("GOOGLE_API_KEY"))
+                logger.info(f"Created LLM client {model} (temperature={temperature})")
+    return _models[key]
+
+def llm(temperature, model=LLM_MODEL):
+    """The shared model for (model, temperature), behind the concurrency limit."""
+    return Limited(get_model(temperature, model), f"{model}@{temperature}")
+
+def register_chain(name, builder):
+    """Register builder(), which returns a chain; it runs once, on first use or in build_all()."""
+    _chain_builders[name] = builder
+
+def get_chain(name):
+    """The prebuilt chain registered under name, behind the concurrency limit."""
+    if name not in _chains:
+        with _lock:
+            if name not in _chains:
+                _chains[name] = _chain_builders[name]()
+                logger.info(f"Built chain {name}")
+    return Limited(_chains[name], name)
+
+def build_all():
+    """Build every registered chain now (startup), so no request pays for it."""
+    for name in list(_chain_builders):
+        get_chain(name)
+
+def stream_chain(name, inputs):
+    """Stream the answer of a prebuilt "stuff" QA chain as text deltas, straight from its model.
+
+    load_qa_chain chains only return the finished answer, so the prompt is filled in the
+    same way the chain does and sent to the chain's model with stream().
+    """
+    from langchain_core.prompts import format_document
+
+    chain = get_chain(name).runnable
+    inputs = dict(inputs)
+    documents = inputs.pop("input_documents", [])
+    inputs[chain.document_variable_name] = chain.document_separator.join(
+        format_document(document, chain.document_prompt) for document in documents)
+    prompt = chain.llm_chain.prompt.format(**inputs)
+    for chunk in Limited(chain.llm_chain.llm, name).stream(prompt):
+        yield chunk.content
@@ -0,0 +1,140 @@
+import os
+import re
+import argparse
+import logging
+import weaviate
+from weaviate.util import generate_uuid5
+from dotenv import load_dotenv
+from vector_stores import USER_PROFILE_CLASS, MEDICAL_REPORT_CLASS, TENANT_SCHEMAS, tenant_filter
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+PAGE_SIZE = 100
+
+# Legacy per-user classes and the shared class each one moves into
+LEGACY_CLASS_PATTERNS = [
+    (re.compile(r"^User_([0-9a-fA-F]{24})_MedicalReport$"), MEDICAL_REPORT_CLASS, "text"),
+    (re.compile(r"^User_([0-9a-fA-F]{24})$"), USER_PROFILE_CLASS, "content"),
+]
+
+def legacy_classes(client):
+    """Yield (class_name, user_id, target_class, target_text_key, source_text_key) for every per-user class."""
+    for class_schema in client.schema.get().get("classes", []):
+        class_name = class_schema["class"]
+        for pattern, target_class, target_key in LEGACY_CLASS_PATTERNS:
+            match = pattern.match(class_name)
+            if match:
+                property_names = [prop["name"] for prop in class_schema.get("properties", [])]
+                source_key = "content" if "content" in property_names else "text"
+                yield class_name, match.group(1), target_class, target_key, source_key
+                break
+
+def iter_objects(client, class_name, text_key):
+    """Page through every object of class_name with its vector, using cursor pagination."""
+    after = None
+    while True:
+        query = (client.query.get(class_name, [text_key])
+                 .with_additional(["id", "vector"])
+                 .with_limit(PAGE_SIZE))
+        if after:
+            query = query.with_after(after)
+        objects = query.do().get("data", {}).get("Get", {}).get(class_name) or []
+        if not objects:
+            return
+        for obj in objects:
+            yield obj
+        after = objects[-1]["_additional"]["id"]
+
+def count_objects(client, class_name, where=None):
+    query = client.query.aggregate(class_name).with_meta_count()
+    if where:
+        query = query.with_where(where)
+    response = query.do()
+    return response.get("data", {}).get("Aggregate", {}).get(class_name, [{}])[0].get("meta", {}).get("count", 0)
+
+def migrate_class(client, class_name, user_id, target_class, target_key, source_key, dry_run=False):
+    """Copy one legacy class into its shared class tagged with user_id; return (object count, failed ids)."""
+    count = 0
+    failed = []
+    if dry_run:
+        for _ in iter_objects(client, class_name, source_key):
+            count += 1
+        return count, failed
+
+    # Per-object import errors do not raise in batch mode; they only reach this callback
+    def collect_errors(results):
+        for result in results or []:
+            if result.get("result", {}).get("errors"):
+                failed.append(result.get("id"))
+                logger.error(f"Failed to import object {result.get('id')} from {class_name}: {result['result']['errors']}")
+
+    client.batch.configure(callback=collect_errors)
+    with client.batch as batch:
+        for obj in iter_objects(client, class_name, source_key):
+            batch.add_data_object(
+                data_object={target_key: obj.get(source_key) or "", "user_id": user_id},
+                class_name=target_class,
+                # Derived from the legacy id, so a rerun overwrites instead of duplicating
+                uuid=generate_uuid5(obj["_additional"]["id"], target_class),
+                vector=obj["_additional"].get("vector")
+            )
+            count += 1
+    return count, failed
+
+def verify_migration(client, class_name, user_id, target_class, failed):
+    """Whether every object of the legacy class made it into the shared class, so it can be dropped."""
+    if failed:
+        logger.error(f"Keeping {class_name}: {len(failed)} objects failed to import")
+        return False
+    source_count = count_objects(client, class_name)
+    target_count = count_objects(client, target_class, tenant_filter(user_id))
+    if target_count < source_count:
+        logger.error(f"Keeping {class_name}: {target_class} holds {target_count} objects for user {user_id}, expected at least {source_count}")
+        return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Move per-user Weaviate classes into the shared UserProfile/MedicalReport classes")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be migrated")
+    parser.add_argument("--delete-old", action="store_true", help="Drop each legacy class after it was copied")
+    args = parser.parse_args()
+
+    client = weaviate.Client(
+        url=os.getenv("WEAVIATE_URL"),
+        auth_client_secret=weaviate.auth.AuthApiKey(api_key=os.getenv("WEAVIATE_API_KEY")),
+        timeout_config=(10, 60)  # 10s connection, 60s read
+    )
+
+    if not args.dry_run:
+        for schema in TENANT_SCHEMAS:
+            if not client.schema.exists(schema["class"]):
+                client.schema.create_class(schema)
+                logger.info(f"Created Weaviate class: {schema['class']}")
+
+    migrated_classes = 0
+    migrated_objects = 0
+    kept_classes = 0
+    for class_name, user_id, target_class, target_key, source_key in legacy_classes(client):
+        count, failed = migrate_class(client, class_name, user_id, target_class, target_key, source_key, args.dry_run)
+        action = "Would migrate" if args.dry_run else "Migrated"
+        logger.info(f"{action} {count} objects from {class_name} to {target_class} (user_id={user_id})")
+        migrated_classes += 1
+        migrated_objects += count
+        if args.delete_old and not args.dry_run:
+            if verify_migration(client, class_name, user_id, target_class, failed):
+                client.schema.delete_class(class_name)
+                logger.info(f"Deleted legacy class: {class_name}")
+            else:
+                kept_classes += 1
+
+    logger.info(f"Done: {migrated_objects} objects from {migrated_classes} legacy classes")
+    if kept_classes:
+        logger.warning(f"{kept_classes} legacy classes were kept because their migration could not be verified; rerun to retry them")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import io
+import os
+import logging
+import tempfile
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from image_io import ocr_image_bytes, ocr_text
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Processes reading pages in parallel (0 reads pages on the calling thread), pages per
+# task, and how many tasks may run ahead of the consumer
+PDF_EXTRACT_PROCESSES = int(os.getenv("PDF_EXTRACT_PROCESSES", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+PDF_TASKS_AHEAD = int(os.getenv("PDF_TASKS_AHEAD", str(max(2, PDF_EXTRACT_PROCESSES * 2))))
+# Resolution for rasterizing pages that have no text layer
+PDF_OCR_DPI = int(os.getenv("PDF_OCR_DPI", "200"))
+
+def clean_text(text):
+    return text.encode('utf-8', 'replace').decode('utf-8')
+
+def open_for_rasterizing(source):
+    """Open a PDF (bytes or path) with PyMuPDF, or return None if PyMuPDF is not installed."""
+    try:
+        import fitz
+    except ImportError:
+        logger.warning("PyMuPDF is not installed; image-only PDF pages cannot be OCR'd")
+        return None
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+def rasterize_page(document, page_index, dpi=PDF_OCR_DPI):
+    """Render one page of an open PyMuPDF document to PNG bytes."""
+    return document[page_index].get_pixmap(dpi=dpi).tobytes("png")
+
+def extract_page_range(source, start, stop, rasterize=True):
+    """Return [(page_index, text, png_or_None)] for pages start..stop-1 of a PDF given as bytes or a path.
+
+    Image-only pages come back rasterized; the document is opened for that at most once per call.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+    document = None
+    pages = []
+    try:
+        for page_index in range(start, min(stop, len(reader.pages))):
+            text = clean_text(reader.pages[page_index].extract_text() or "")
+            image = None
+            if rasterize and not text.strip():
+                if document is None:
+                    document = open_for_rasterizing(source) or False
+                if document:
+                    image = rasterize_page(document, page_index)
+            pages.append((page_index, text, image))
+    finally:
+        if document:
+            document.close()
+    return pages
+
+def count_pages(data):
+    from pypdf import PdfReader
+
+    return len(PdfReader(io.BytesIO(data)).pages)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_page_pool():
+    """Return the shared page-extraction process pool, starting it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn, not fork: callers are multi-threaded web/job workers
+                _pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_PROCESSES,
+                                            mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def iter_pdf_pages(data, ocr=None, processes=PDF_EXTRACT_PROCESSES):
+    """Yield (page_number, text) for every page in order, as soon as each page is ready.
+
+    Pages are read in parallel across processes; pages without a text layer are
+    rasterized and passed to ocr (a PaddleOCR-compatible engine) if one is given.
+    """
+    total = count_pages(data)
+    ranges = [(start, start + PDF_PAGES_PER_TASK) for start in range(0, total, PDF_PAGES_PER_TASK)]
+    rasterize = ocr is not None
+
+    path = None
+    if processes <= 0 or len(ranges) <= 1:
+        results = (extract_page_range(data, start, stop, rasterize) for start, stop in ranges)
+    else:
+        # Workers read the document from one temporary file instead of each task pickling the bytes
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+            temp_file.write(data)
+            path = temp_file.name
+        results = _ordered_results(get_page_pool(), path, ranges, rasterize)
+
+    ocr_pages = 0
+    try:
+        for pages in results:
+            for page_index, text, image in pages:
+                if image is not None:
+                    ocr_pages += 1
+                    text = clean_text(ocr_text(ocr_image_bytes(ocr, image, f"page-{page_index + 1}.png")))
+                elif not text.strip():
+                    logger.debug(f"Page {page_index + 1} has no text layer and no OCR engine was given")
+                yield page_index + 1, text
+    finally:
+        results.close()
+        if path:
+            os.remove(path)
+    logger.info(f"Extracted {total} PDF pages ({ocr_pages} via OCR)")
+
+def _ordered_results(pool, path, ranges, rasterize):
+    """Submit page ranges with a bounded window and yield their results in page order."""
+    pending = deque()
+    next_range = 0
+    try:
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < PDF_TASKS_AHEAD:
+                start, stop = ranges[next_range]
+                pending.append(pool.submit(extract_page_range, path, start, stop, rasterize))
+                next_range += 1
+            yield pending.popleft().result()
+    finally:
+        # The consumer stopped early (or failed): drop work that has not started
+        for future in pending:
+            future.cancel()
+
+def extract_pdf_text(data, ocr=None, processes=PDF_EXTRACT_PROCESSES):
+    """Whole-document text, one page per line block."""
+    return "\n".join(text for _, text in iter_pdf_pages(data, ocr=ocr, processes=processes) if text)
+
+def iter_chunks(pages, chunk_size=500):
+    """Yield chunks of up to chunk_size words from (page_number, text) pairs, page by page.
+
+    Chunks never span pages, so editing one page only changes that page's chunks and
+    re-ingestion re-embeds just those.
+    """
+    for _, text in pages:
+        words = text.split()
+        for i in range(0, len(words), chunk_size):
+            yield ' '.join(words[i:i + chunk_size])
@@ -1,10 +1,17 @@
 import weaviate
-from pypdf import PdfReader
 import google.generativeai as genai
+from embedding_cache import cached_embed_content
 from dotenv import load_dotenv
 import os
 import logging
 import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from weaviate.util import generate_uuid5
+from rate_limit import TokenBucket, retry_call
+from vector_stores import KNOWLEDGE_PROPERTIES, source_filter, ids_filter, delete_where
+from pdf_extract import iter_pdf_pages, iter_chunks
 
 # Set up logging to include debug messages
 logging.basicConfig(level=logging.INFO)
@@ -34,34 +41,44 @@ except Exception as e:
 # Configure Gemini API
 genai.configure(api_key=GEMINI_API_KEY)
 
+# Embedding throughput settings: chunks per request, parallel requests, and a
+# process-wide request budget shared by concurrent ingestions
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_MAX_WORKERS = int(os.getenv("EMBED_MAX_WORKERS", "4"))
+EMBED_REQUESTS_PER_MINUTE = float(os.getenv("EMBED_REQUESTS_PER_MINUTE", "120"))
+embed_rate_limiter = TokenBucket(rate=EMBED_REQUESTS_PER_MINUTE / 60.0, capacity=EMBED_MAX_WORKERS)
+
+# Weaviate write settings: objects per batch import and ids per delete request
+WRITE_BATCH_SIZE = int(os.getenv("WEAVIATE_WRITE_BATCH_SIZE", "100"))
+DELETE_BATCH_SIZE = int(os.getenv("WEAVIATE_DELETE_BATCH_SIZE", "100"))
+batch_lock = threading.Lock()
+# Objects read per query when listing a source's stored chunks
+READ_PAGE_SIZE = int(os.getenv("WEAVIATE_READ_PAGE_SIZE", "1000"))
+# Classes whose objects without a source are chunks of PDFs uploaded before per-source
+# syncing, which every upload used to replace; elsewhere (food_analyse holds user food
+# analyses) source-less objects are never touched
+LEGACY_PDF_CLASSES = [name.strip().capitalize() for name in os.getenv("LEGACY_PDF_CLASSES", "Admin").split(",") if name.strip()]
+
 # Step 1: Extract text from PDF with enhanced handling for URLs and invalid characters
-def extract_text_from_pdf(pdf_file):
-    """Extract text from a PDF file object with enhanced handling for URLs and invalid characters."""
+def extract_pages_from_pdf(pdf_file, ocr=None):
+    """Extract [(page_number, text)] from a PDF file object (or bytes), reading pages in parallel; ocr handles image-only pages."""
     try:
-        reader = PdfReader(pdf_file)
-        text = ''
-        for page_num, page in enumerate(reader.pages):
-            extracted = page.extract_text() or ""
-            if extracted:
-                logger.debug(f"Raw extracted text (page {page_num + 1}, first 100 chars): {repr(extracted[:100])}...")
-                cleaned_text = extracted.encode('utf-8', 'replace').decode('utf-8')
-                logger.debug(f"Cleaned text (page {page_num + 1}, first 100 chars): {repr(cleaned_text[:100])}...")
-                text += cleaned_text + "\n"
-        if not text.strip():
+        data = pdf_file.read() if hasattr(pdf_file, 'read') else pdf_file
+        pages = [(page_number, text) for page_number, text in iter_pdf_pages(data, ocr=ocr) if text]
+        if not any(text.strip() for _, text in pages):
             raise ValueError(
                 "No text extracted from PDF. This PDF may be image-based or contain corrupted data (e.g., from URLs). Consider using a text-based PDF or OCR.")
-        try:
-            text.encode('utf-8')
-            logger.debug(f"Final text (first 100 chars): {repr(text[:100])}...")
-        except UnicodeEncodeError as e:
-            logger.error(f"Invalid Unicode detected in final text: {str(e)}")
-            raise
         logger.info("Text extracted from PDF successfully")
-        return text
+        return pages
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {str(e)}")
         raise
 
+def extract_text_from_pdf(pdf_file, ocr=None):
+    """Extract the text of a PDF file object (or bytes) as one string."""
+    # Pages are collected in a list and joined once instead of growing one string
+    return "\n".join(text for _, text in extract_pages_from_pdf(pdf_file, ocr=ocr)) + "\n"
+
 # Step 2: Chunk the text
 def chunk_text(text, chunk_size=500):
     """Chunk text into segments of specified word size."""
@@ -71,90 +88,211 @@ def chunk_text(text, chunk_size=500):
     return chunks
 
 # Step 3: Generate embeddings using Gemini
-def generate_embeddings(chunks, max_retries=3):
-    """Generate embeddings for text chunks using Gemini with retries."""
-    embeddings = []
-    for i, chunk in enumerate(chunks):
-        attempt = 0
-        while attempt < max_retries:
-            try:
-                logger.info(f"Attempt {attempt + 1}/{max_retries}: Generating embedding for chunk {i + 1}/{len(chunks)}")
-                response = genai.embed_content(
-                    model="models/embedding-001",
-                    content=chunk,
-                    task_type="retrieval_document"
-                )
-                embeddings.append(response['embedding'])
-                logger.info(f"Successfully generated embedding for chunk {i + 1}/{len(chunks)}")
-                break
-            except Exception as e:
-                attempt += 1
-                logger.error(f"Attempt {attempt}/{max_retries} failed for chunk {i + 1}: {str(e)}")
-                if attempt == max_retries:
-                    raise
-                time.sleep(2 ** attempt)
-    logger.info(f"Generated embeddings for {len(embeddings)} chunks")
+def embedding_stats(chunks, seconds):
+    """Chunks embedded, elapsed seconds and chunks/s, as reported in upload results."""
+    return {
+        "embedded_chunks": chunks,
+        "embed_seconds": round(seconds, 3),
+        "chunks_per_second": round(chunks / seconds, 1) if seconds > 0 else float(chunks)
+    }
+
+def generate_embeddings(chunks, max_retries=3, batch_size=EMBED_BATCH_SIZE, max_workers=EMBED_MAX_WORKERS, stats=None):
+    """Generate embeddings for text chunks using batched Gemini requests run by a bounded worker pool.
+
+    If stats is a dict it receives embedding_stats() for this call.
+    """
+    if not chunks:
+        if stats is not None:
+            stats.update(embedding_stats(0, 0.0))
+        return []
+    start = time.time()
+    batches = [chunks[i:i + batch_size] for i in range(0, len(chunks), batch_size)]
+
+    def embed_batch(index):
+        batch = batches[index]
+        description = f"embedding batch {index + 1}/{len(batches)} ({len(batch)} chunks)"
+
+        def request():
+            # Only batches with cache misses reach the API and spend a rate-limit token
+            return cached_embed_content(
+                model="models/embedding-001",
+                content=batch,
+                task_type="retrieval_document",
+                before_request=embed_rate_limiter.acquire
+            )['embedding']
+
+        vectors = retry_call(request, description, max_retries=max_retries)
+        logger.info(f"Successfully generated {description}")
+        return vectors
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+        # map() keeps the batches in chunk order
+        embeddings = [vector for vectors in executor.map(embed_batch, range(len(batches))) for vector in vectors]
+    throughput = embedding_stats(len(embeddings), time.time() - start)
+    logger.info(f"Generated embeddings for {len(embeddings)} chunks in {throughput['embed_seconds']:.2f}s "
+                f"({throughput['chunks_per_second']:.1f} chunks/s)")
+    if stats is not None:
+        stats.update(throughput)
     return embeddings
 
-# Step 4: Upload to Weaviate
-def upload_to_weaviate(chunks, embeddings, collection_name="Admin", max_retries=3):
-    """Upload chunks and embeddings to the specified Weaviate collection with retries."""
+# Step 4: Sync chunks to Weaviate
+def chunk_hash(chunk):
+    return hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+
+def ensure_knowledge_class(schema_name):
+    """Create the class, or add the source/chunk_hash properties to a class created before per-source syncing."""
+    if not client.schema.exists(schema_name):
+        client.schema.create_class({"class": schema_name, "vectorizer": "none", "properties": KNOWLEDGE_PROPERTIES})
+        logger.info(f"Created Weaviate class: {schema_name}")
+        return
+    existing = {prop["name"] for prop in client.schema.get(schema_name).get("properties", [])}
+    for prop in KNOWLEDGE_PROPERTIES:
+        if prop["name"] not in existing:
+            client.schema.property.create(schema_name, prop)
+            logger.info(f"Added property {prop['name']} to Weaviate class {schema_name}")
+
+def count_where(schema_name, where=None):
+    query = client.query.aggregate(schema_name).with_meta_count()
+    if where:
+        query = query.with_where(where)
+    response = query.do()
+    return response.get("data", {}).get("Aggregate", {}).get(schema_name, [{}])[0].get("meta", {}).get("count", 0)
+
+def stored_chunks(schema_name, source):
+    """{chunk_hash: uuid} of source's objects, read from Weaviate so every node sees the same state."""
+    # Offset paging is capped at QUERY_MAXIMUM_RESULTS (10000 chunks, ~5M words per source)
+    recorded = {}
+    offset = 0
+    while True:
+        response = (client.query.get(schema_name, ["chunk_hash"])
+                    .with_additional(["id"])
+                    .with_where(source_filter(source))
+                    .with_limit(READ_PAGE_SIZE)
+                    .with_offset(offset)
+                    .do())
+        objects = response.get("data", {}).get("Get", {}).get(schema_name) or []
+        for obj in objects:
+            recorded[obj.get("chunk_hash")] = obj["_additional"]["id"]
+        if len(objects) < READ_PAGE_SIZE:
+            return recorded
+        offset += READ_PAGE_SIZE
+
+def adopt_legacy_objects(schema_name):
+    """Delete the source-less chunks of PDFs uploaded before per-source syncing; other sources are kept."""
+    if schema_name not in LEGACY_PDF_CLASSES:
+        return 0
+    # Objects missing the property do not match Like "*"; an IsNull filter would need
+    # indexNullState, which classes created before it cannot turn on
+    legacy = count_where(schema_name) - count_where(schema_name, {"path": ["source"], "operator": "Like", "valueText": "*"})
+    if legacy <= 0:
+        return 0
+    legacy_uuids = []
+    after = None
+    while True:
+        query = client.query.get(schema_name, ["source"]).with_additional(["id"]).with_limit(READ_PAGE_SIZE)
+        if after:
+            query = query.with_after(after)
+        objects = query.do().get("data", {}).get("Get", {}).get(schema_name) or []
+        legacy_uuids.extend(obj["_additional"]["id"] for obj in objects if not obj.get("source"))
+        if len(objects) < READ_PAGE_SIZE:
+            break
+        after = objects[-1]["_additional"]["id"]
+    for i in range(0, len(legacy_uuids), DELETE_BATCH_SIZE):
+        delete_where(client, schema_name, ids_filter(legacy_uuids[i:i + DELETE_BATCH_SIZE]))
+    logger.info(f"Removed {len(legacy_uuids)} legacy chunks without a source from {schema_name}")
+    return len(legacy_uuids)
+
+def import_objects(schema_name, objects, max_retries=3):
+    """Batch-import (uuid, data_object, vector) tuples; return the uuids that failed."""
+    failed = set()
+
+    def collect_errors(results):
+        for result in results or []:
+            if result.get("result", {}).get("errors"):
+                failed.add(result.get("id"))
+                logger.error(f"Failed to import object {result.get('id')}: {result['result']['errors']}")
+
+    def request():
+        failed.clear()
+        # The client's batch is shared state, so imports from concurrent ingestions take turns
+        with batch_lock:
+            client.batch.configure(batch_size=WRITE_BATCH_SIZE, dynamic=False, callback=collect_errors)
+            with client.batch as batch:
+                for uuid, data_object, vector in objects:
+                    batch.add_data_object(data_object=data_object, class_name=schema_name, uuid=uuid, vector=vector)
+
+    # Deterministic uuids make a retried import overwrite rather than duplicate
+    retry_call(request, f"importing {len(objects)} objects into {schema_name}", max_retries=max_retries)
+    return failed
+
+def plan_sync(chunks, collection_name="Admin", source="unknown"):
+    """Diff source's chunks against the ones stored in Weaviate; return the plan that embed_plan/apply_plan carry out."""
+    schema_name = collection_name.capitalize()
+    ensure_knowledge_class(schema_name)
+    adopt_legacy_objects(schema_name)
+
+    current = {}
+    for chunk in chunks:
+        cleaned_chunk = chunk.encode('utf-8', 'replace').decode('utf-8')
+        current.setdefault(chunk_hash(cleaned_chunk), cleaned_chunk)
+
+    recorded = stored_chunks(schema_name, source)
+    return {
+        "schema_name": schema_name,
+        "source": source,
+        "current": current,
+        "recorded": recorded,
+        "new_hashes": [digest for digest in current if digest not in recorded],
+        "removed_hashes": [digest for digest in recorded if digest not in current],
+        "vectors": [],
+        "embed_stats": embedding_stats(0, 0.0)
+    }
+
+def embed_plan(plan, max_retries=3):
+    """Embed only the chunks the plan adds, recording the throughput in plan["embed_stats"]."""
+    plan["vectors"] = generate_embeddings([plan["current"][digest] for digest in plan["new_hashes"]],
+                                          max_retries=max_retries, stats=plan["embed_stats"])
+    return plan
+
+def apply_plan(plan, max_retries=3):
+    """Import the plan's new chunks and delete its removed ones."""
+    schema_name, source = plan["schema_name"], plan["source"]
+    added = {}
+    failed = set()
+    if plan["new_hashes"]:
+        objects = [
+            (generate_uuid5(f"{source}:{digest}", schema_name),
+             {"text": plan["current"][digest], "source": source, "chunk_hash": digest},
+             vector)
+            for digest, vector in zip(plan["new_hashes"], plan["vectors"])
+        ]
+        failed = import_objects(schema_name, objects, max_retries=max_retries)
+        added = {digest: uuid for (uuid, _, _), digest in zip(objects, plan["new_hashes"]) if uuid not in failed}
+
+    if plan["removed_hashes"]:
+        removed_uuids = [plan["recorded"][digest] for digest in plan["removed_hashes"]]
+        for i in range(0, len(removed_uuids), DELETE_BATCH_SIZE):
+            delete_where(client, schema_name, ids_filter(removed_uuids[i:i + DELETE_BATCH_SIZE]))
+
+    if failed:
+        raise Exception(f"{len(failed)} chunks failed to import into {schema_name}")
+    return {
+        "added": len(added),
+        "removed": len(plan["removed_hashes"]),
+        "unchanged": len(plan["current"]) - len(plan["new_hashes"]),
+        **plan["embed_stats"]
+    }
+
+def upload_to_weaviate(chunks, collection_name="Admin", source="unknown", max_retries=3):
+    """Bring source's chunks in the collection up to date: embed and import new chunks, delete removed ones."""
     try:
-        logger.info(f"Starting upload to Weaviate collection: {collection_name}")
-        schema_name = collection_name.capitalize()
-        schema = {
-            "class": schema_name,
-            "vectorizer": "none",
-            "properties": [{"name": "text", "dataType": ["text"]}]
-        }
-        if not client.schema.exists(schema_name):
-            client.schema.create_class(schema)
-            logger.info(f"Created Weaviate class: {schema_name}")
-        else:
-            logger.info(f"Class {schema_name} already exists")
-
-        # Safely handle object deletion
-        try:
-            result = client.data_object.get(class_name=schema_name)
-            logger.debug(f"Get objects response: {result}")
-            if result and isinstance(result, dict) and 'objects' in result and result['objects']:
-                for obj in result['objects']:
-                    if '_additional' in obj and 'id' in obj['_additional']:
-                        client.data_object.delete(uuid=obj['_additional']['id'], class_name=schema_name)
-                        logger.info(f"Deleted object with ID: {obj['_additional']['id']}")
-                    else:
-                        logger.warning(f"Object missing '_additional' or 'id': {obj}")
-            else:
-                logger.info("No existing objects to delete or invalid response")
-        except Exception as e:
-            logger.error(f"Error deleting existing objects: {str(e)} - Skipping deletion")
-            pass  # Skip deletion if it fails to avoid breaking the process
-
-        # Upload chunks with embeddings
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            attempt = 0
-            while attempt < max_retries:
-                try:
-                    logger.debug(f"Attempt {attempt + 1}/{max_retries}: Uploading chunk {i + 1}/{len(chunks)}")
-                    cleaned_chunk = chunk.encode('utf-8', 'replace').decode('utf-8')
-                    data_object = {
-                        "text": cleaned_chunk,
-                        "vector": embedding
-                    }
-                    logger.debug(f"Data object for chunk {i + 1}: {data_object}")
-                    client.data_object.create(
-                        data_object=data_object,
-                        class_name=schema_name
-                    )
-                    logger.debug(f"Successfully uploaded chunk {i + 1}/{len(chunks)}")
-                    break
-                except Exception as e:
-                    attempt += 1
-                    logger.error(f"Attempt {attempt}/{max_retries} failed for chunk {i + 1}: {str(e)} - Full exception: {repr(e)}")
-                    if attempt == max_retries:
-                        raise
-                    time.sleep(2 ** attempt)
-        logger.info(f"Total number of chunks uploaded to {schema_name}: {len(chunks)}")
+        start = time.time()
+        logger.info(f"Syncing {source} to Weaviate collection: {collection_name}")
+        plan = embed_plan(plan_sync(chunks, collection_name, source), max_retries=max_retries)
+        stats = apply_plan(plan, max_retries=max_retries)
+        stats["seconds"] = round(time.time() - start, 3)
+        logger.info(f"Synced {source} into {plan['schema_name']}: {stats}")
+        return stats
     except Exception as e:
         logger.error(f"Error uploading to Weaviate: {str(e)} - Full exception: {repr(e)}")
         raise
@@ -173,19 +311,24 @@ def count_objects_in_collection(collection_name="Admin"):
         return 0
 
 # Main function to process admin PDF
-def process_admin_pdf(file, collection):
-    """Process a PDF file and optionally upload to Weaviate."""
+def process_admin_pdf(file, collection, source=None):
+    """Process a PDF file and sync its chunks into the Weaviate collection."""
     try:
-        text = extract_text_from_pdf(file)
-        logger.debug(f"Final extracted text (first 100 chars): {repr(text[:100])}...")
-        chunks = chunk_text(text)
-        embeddings = generate_embeddings(chunks)
-        upload_to_weaviate(chunks, embeddings, collection)
+        source = source or getattr(file, 'filename', None) or "unknown"
+        pages = extract_pages_from_pdf(file)
+        text_length = sum(len(text) for _, text in pages)
+        # Page-aligned chunks: an edited page re-embeds only its own chunks
+        chunks = list(iter_chunks(pages))
+        logger.info(f"Text chunked into {len(chunks)} segments")
+        stats = upload_to_weaviate(chunks, collection, source)
         count = count_objects_in_collection(collection)
-        return f"Successfully processed PDF for collection {collection}. Extracted text length: {len(text)} characters. Uploaded {count} objects."
+        return (f"Successfully processed PDF for collection {collection}. Extracted text length: {text_length} characters. "
+                f"{stats['added']} chunks added, {stats['removed']} removed, {stats['unchanged']} unchanged in {stats['seconds']:.1f}s "
+                f"({stats['embedded_chunks']} chunks embedded in {stats['embed_seconds']:.1f}s, {stats['chunks_per_second']:.1f} chunks/s). "
+                f"Collection holds {count} objects.")
     except ValueError as e:
         logger.error(f"Error processing admin PDF: {str(e)}")
         raise ValueError(str(e))
     except Exception as e:
         logger.error(f"Failed to process admin PDF: {str(e)}")
-        raise Exception(f"Failed to process PDF: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Failed to process PDF: {str(e)}")
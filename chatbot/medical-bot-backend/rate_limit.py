@@ -0,0 +1,42 @@
+import logging
+import threading
+import time
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        """Allow `rate` operations per second on average, with bursts up to `capacity`."""
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available, then take them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+def retry_call(fn, description, max_retries=3, base_delay=2):
+    """Call fn() with exponential backoff (2s, 4s, ...) and re-raise after max_retries attempts."""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            attempt += 1
+            logger.error(f"Attempt {attempt}/{max_retries} failed for {description}: {str(e)}")
+            if attempt >= max_retries:
+                raise
+            time.sleep(base_delay ** attempt)
@@ -0,0 +1,137 @@
+import os
+import logging
+import threading
+import time
+from functools import wraps
+from flask import jsonify
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+INITIALIZING = "initializing"
+READY = "ready"
+FAILED = "failed"
+
+# Required subsystems retry with exponential backoff (a sidecar or database may still be
+# starting); after the last attempt they stay FAILED and /healthz reports the process dead
+INIT_MAX_ATTEMPTS = int(os.getenv("READINESS_MAX_ATTEMPTS", "8"))
+INIT_RETRY_SECONDS = float(os.getenv("READINESS_RETRY_SECONDS", "2"))
+INIT_RETRY_MAX_SECONDS = float(os.getenv("READINESS_RETRY_MAX_SECONDS", "30"))
+
+class Subsystem:
+    def __init__(self, name, init, depends_on=(), required=True, gates_readiness=True):
+        """A heavy dependency initialized on a background thread instead of at import time."""
+        self.name = name
+        self.init = init
+        self.depends_on = tuple(depends_on)
+        self.required = required
+        # False for heavy models only some routes need; @requires still gates those routes
+        self.gates_readiness = gates_readiness
+        self.state = PENDING
+        self.attempts = 0
+        self.error = None
+        self.duration = None
+        self._done = threading.Event()
+
+    def run(self):
+        for dependency in self.depends_on:
+            _subsystems[dependency].wait()
+            if _subsystems[dependency].state == FAILED and _subsystems[dependency].required:
+                self._finish(FAILED, f"dependency {dependency} failed")
+                return
+        self.state = INITIALIZING
+        start = time.time()
+        max_attempts = INIT_MAX_ATTEMPTS if self.required else 1
+        delay = INIT_RETRY_SECONDS
+        while True:
+            self.attempts += 1
+            try:
+                self.init()
+                self.duration = time.time() - start
+                self._finish(READY)
+                logger.info(f"Subsystem {self.name} ready in {self.duration:.2f}s")
+                return
+            except Exception as e:
+                self.error = str(e)
+                if self.attempts >= max_attempts:
+                    self.duration = time.time() - start
+                    self._finish(FAILED, str(e))
+                    logger.error(f"Subsystem {self.name} failed to initialize after {self.attempts} attempts: {str(e)}", exc_info=True)
+                    return
+                logger.warning(f"Subsystem {self.name} failed to initialize (attempt {self.attempts}/{max_attempts}): {str(e)}. "
+                               f"Retrying in {delay:.0f}s...")
+                time.sleep(delay)
+                delay = min(delay * 2, INIT_RETRY_MAX_SECONDS)
+
+    def _finish(self, state, error=None):
+        self.state = state
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """Block until initialization finished (successfully or not); return False on timeout."""
+        return self._done.wait(timeout)
+
+    def usable(self):
+        """Ready, or failed in a way callers are written to tolerate (required=False)."""
+        return self.state == READY or (self.state == FAILED and not self.required)
+
+# Registered subsystems, in registration order
+_subsystems = {}
+
+def register(name, init, depends_on=(), required=True, gates_readiness=True):
+    _subsystems[name] = Subsystem(name, init, depends_on, required, gates_readiness)
+    return _subsystems[name]
+
+def start_all():
+    """Start initializing every registered subsystem on its own background thread."""
+    for subsystem in _subsystems.values():
+        if subsystem.state == PENDING:
+            threading.Thread(target=subsystem.run, name=f"init-{subsystem.name}", daemon=True).start()
+
+def wait_for(names, timeout):
+    """Wait up to timeout seconds in total; return the names that are still not usable."""
+    deadline = time.monotonic() + timeout
+    unavailable = []
+    for name in names:
+        subsystem = _subsystems[name]
+        subsystem.wait(max(0.0, deadline - time.monotonic()))
+        if not subsystem.usable():
+            unavailable.append(name)
+    return unavailable
+
+def report():
+    """Per-subsystem readiness for /readyz, plus whether every required subsystem that gates readiness is usable."""
+    subsystems = {
+        name: {
+            "state": subsystem.state,
+            "required": subsystem.required,
+            "gates_readiness": subsystem.gates_readiness,
+            "error": subsystem.error,
+            "attempts": subsystem.attempts,
+            "init_seconds": round(subsystem.duration, 3) if subsystem.duration is not None else None
+        }
+        for name, subsystem in _subsystems.items()
+    }
+    ready = all(subsystem.usable() for subsystem in _subsystems.values() if subsystem.required and subsystem.gates_readiness)
+    return ready, subsystems
+
+def failed_required():
+    """Names of required subsystems that gave up initializing; the process cannot recover by itself."""
+    return [name for name, subsystem in _subsystems.items() if subsystem.required and subsystem.state == FAILED]
+
+def requires(*names, timeout=30):
+    """Route decorator: wait briefly for the named subsystems, else answer 503 instead of failing later."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            unavailable = wait_for(names, timeout)
+            if unavailable:
+                logger.warning(f"Rejecting {f.__name__}: subsystems not ready: {', '.join(unavailable)}")
+                return jsonify({"error": "Service is starting up. Please try again shortly.",
+                                "unavailable": unavailable}), 503
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
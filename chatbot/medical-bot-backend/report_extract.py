@@ -0,0 +1,55 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from image_io import ocr_image_bytes, ocr_text
+from pdf_extract import PDF_EXTRACT_PROCESSES, extract_pdf_text
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Worker processes that extract report text; each loads its own PaddleOCR engine.
+# 0 runs extraction on the calling thread with the caller's OCR engine instead.
+REPORT_OCR_PROCESSES = int(os.getenv("REPORT_OCR_PROCESSES", "2"))
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+REPORT_EXTENSIONS = IMAGE_EXTENSIONS + ('.pdf',)
+
+# OCR engine of the current pool process
+_ocr = None
+
+def _init_worker():
+    """Pool initializer: load PaddleOCR once per worker process."""
+    global _ocr
+    from paddleocr import PaddleOCR
+
+    _ocr = PaddleOCR(use_angle_cls=True, lang='en', use_gpu=False)
+    logger.info(f"Report extraction worker {os.getpid()} ready")
+
+def extract_report_text(data, filename, ocr=None):
+    """Extract the text of an uploaded report image or PDF (OCR uses ocr, or this process's engine)."""
+    lower_name = filename.lower()
+    if lower_name.endswith(IMAGE_EXTENSIONS):
+        return ocr_text(ocr_image_bytes(ocr or _ocr, data, filename))
+    if lower_name.endswith('.pdf'):
+        # Inside a pool process the pages are read here; otherwise across the page pool
+        processes = PDF_EXTRACT_PROCESSES if ocr is not None else 0
+        return extract_pdf_text(data, ocr=ocr or _ocr, processes=processes)
+    return ""
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_extraction_pool():
+    """Return the shared extraction process pool, starting it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn, not fork: the web process is multi-threaded and holds sockets
+                _pool = ProcessPoolExecutor(max_workers=REPORT_OCR_PROCESSES,
+                                            mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=_init_worker)
+                logger.info(f"Started report extraction pool with {REPORT_OCR_PROCESSES} processes")
+    return _pool
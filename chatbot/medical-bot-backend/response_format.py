@@ -0,0 +1,72 @@
+import re
+
+class IncrementalHtmlFormatter:
+    def __init__(self):
+        """Line-by-line version of format_response_to_html for text that arrives in pieces."""
+        self.in_list = False
+        self.current_section = None
+        self._pending = ""
+
+    def _close_list(self):
+        return '</ul>' if self.current_section == 'bulleted' else '</ol>'
+
+    def _format_line(self, line):
+        """HTML fragments for one complete line of model output."""
+        html_lines = []
+        line = line.strip()
+        if not line:
+            return html_lines
+
+        if line.startswith('- **'):
+            if self.in_list:
+                html_lines.append(self._close_list())
+                self.in_list = False
+            section_title = line[4:line.rfind(':**')].strip() if line.endswith(':**') else line[4:].strip()
+            html_lines.append(f'<strong>{section_title}:</strong>')
+        elif line.startswith('* - '):
+            if not self.in_list or self.current_section == 'numbered':
+                if self.in_list:
+                    html_lines.append('</ol>' if self.current_section == 'numbered' else '</ul>')
+                html_lines.append('<ul>')
+                self.in_list = True
+                self.current_section = 'bulleted'
+            item = line.replace('* - ', '').strip()
+            html_lines.append(f'<li>{item}</li>')
+        elif re.match(r'^\d+\.', line):
+            if not self.in_list or self.current_section == 'bulleted':
+                if self.in_list:
+                    html_lines.append(self._close_list())
+                html_lines.append('<ol>')
+                self.in_list = True
+                self.current_section = 'numbered'
+            item = line[line.find(' ') + 1:].strip()
+            html_lines.append(f'<li>{item}</li>')
+        else:
+            if self.in_list:
+                html_lines.append(self._close_list())
+                self.in_list = False
+            html_lines.append(f'<p>{line}</p>')
+        return html_lines
+
+    def feed(self, text):
+        """Add streamed text; return the HTML for every line it completed ('' if none)."""
+        self._pending += text
+        *lines, self._pending = self._pending.split('\n')
+        return ''.join(fragment for line in lines for fragment in self._format_line(line))
+
+    def close(self):
+        """Format the unfinished last line and close any open list."""
+        html = ''.join(self._format_line(self._pending))
+        self._pending = ""
+        if self.in_list:
+            html += self._close_list()
+            self.in_list = False
+        return html
+
+# Function to convert structured text to HTML string
+def format_response_to_html(text):
+    if not text or not isinstance(text, str):
+        return "<p>Error: Invalid response format.</p>"
+
+    formatter = IncrementalHtmlFormatter()
+    return formatter.feed(text) + formatter.close()
@@ -0,0 +1,135 @@
+import os
+import logging
+import threading
+import time
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Positive answers rarely change (classes are only created, at startup); negative ones
+# are kept short so a shared class created by another worker's startup shows up quickly
+CLASS_EXISTS_TTL = float(os.getenv("WEAVIATE_CLASS_EXISTS_TTL", "300"))
+CLASS_MISSING_TTL = float(os.getenv("WEAVIATE_CLASS_MISSING_TTL", "30"))
+
+# Per-user vectors live in two shared collections partitioned by a user_id property,
+# instead of one User_{id} / User_{id}_MedicalReport class per user
+USER_PROFILE_CLASS = "UserProfile"
+MEDICAL_REPORT_CLASS = "MedicalReport"
+
+TENANT_SCHEMAS = [
+    {
+        "class": USER_PROFILE_CLASS,
+        "vectorizer": "none",
+        "properties": [
+            {"name": "content", "dataType": ["text"]},
+            {"name": "user_id", "dataType": ["text"], "tokenization": "field"}
+        ]
+    },
+    {
+        "class": MEDICAL_REPORT_CLASS,
+        "vectorizer": "none",
+        "properties": [
+            {"name": "text", "dataType": ["text"]},
+            {"name": "user_id", "dataType": ["text"], "tokenization": "field"}
+        ]
+    }
+]
+
+# Admin/food_analyse objects: chunk text plus where it came from, for incremental re-ingestion
+KNOWLEDGE_PROPERTIES = [
+    {"name": "text", "dataType": ["text"]},
+    {"name": "source", "dataType": ["text"], "tokenization": "field"},
+    {"name": "chunk_hash", "dataType": ["text"], "tokenization": "field"}
+]
+
+# Batch deletes need a where-filter; this one matches every object in a class
+ALL_OBJECTS_FILTER = {"path": ["id"], "operator": "Like", "valueText": "*"}
+
+def tenant_filter(user_id):
+    """Weaviate where-filter selecting one user's objects in a shared collection."""
+    return {"path": ["user_id"], "operator": "Equal", "valueText": str(user_id)}
+
+def source_filter(source):
+    """Weaviate where-filter selecting the chunks of one ingested source document."""
+    return {"path": ["source"], "operator": "Equal", "valueText": source}
+
+def ids_filter(uuids):
+    """Weaviate where-filter matching any of the given object ids."""
+    operands = [{"path": ["id"], "operator": "Equal", "valueText": uuid} for uuid in uuids]
+    return operands[0] if len(operands) == 1 else {"operator": "Or", "operands": operands}
+
+def delete_where(client, class_name, where=None):
+    """Delete every object in class_name matching where (all objects if None) with batch deletes.
+
+    Weaviate caps one batch delete at QUERY_MAXIMUM_RESULTS matches, so repeat until
+    nothing matches. Returns {"deleted", "failed", "requests", "seconds"}.
+    """
+    start = time.time()
+    deleted = failed = requests = 0
+    while True:
+        response = client.batch.delete_objects(
+            class_name=class_name,
+            where=where or ALL_OBJECTS_FILTER,
+            output="minimal"
+        )
+        requests += 1
+        results = (response or {}).get("results", {})
+        deleted += results.get("successful", 0)
+        failed += results.get("failed", 0)
+        # Stop when the last call removed everything it matched (or could not remove anything)
+        if results.get("matches", 0) < results.get("limit", 0) or not results.get("successful", 0):
+            break
+    elapsed = time.time() - start
+    logger.info(f"Deleted {deleted} objects from {class_name} in {requests} request(s), {elapsed:.2f}s ({failed} failed)")
+    return {"deleted": deleted, "failed": failed, "requests": requests, "seconds": round(elapsed, 3)}
+
+class VectorStoreRegistry:
+    def __init__(self, client=None, embeddings=None, exists_ttl=CLASS_EXISTS_TTL, missing_ttl=CLASS_MISSING_TTL):
+        """Reusable LangChain Weaviate handles per class plus a TTL'd class-existence cache."""
+        self.client = client
+        self.embeddings = embeddings
+        self.exists_ttl = exists_ttl
+        self.missing_ttl = missing_ttl
+        self._stores = {}
+        self._exists = {}
+        self._lock = threading.Lock()
+
+    def store(self, class_name, text_key="text"):
+        """Return the shared vector store for class_name, creating the wrapper on first use."""
+        key = (class_name, text_key)
+        with self._lock:
+            vector_store = self._stores.get(key)
+        if vector_store is None:
+            from langchain_community.vectorstores import Weaviate
+
+            vector_store = Weaviate(
+                client=self.client,
+                index_name=class_name,
+                text_key=text_key,
+                embedding=self.embeddings,
+                by_text=False
+            )
+            with self._lock:
+                vector_store = self._stores.setdefault(key, vector_store)
+        return vector_store
+
+    def _set_exists(self, class_name, exists):
+        ttl = self.exists_ttl if exists else self.missing_ttl
+        with self._lock:
+            self._exists[class_name] = (exists, time.monotonic() + ttl)
+
+    def class_exists(self, class_name):
+        """schema.exists with a TTL cache that our own create_class calls keep current."""
+        with self._lock:
+            cached = self._exists.get(class_name)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        exists = self.client.schema.exists(class_name)
+        self._set_exists(class_name, exists)
+        return exists
+
+    def create_class(self, schema):
+        self.client.schema.create_class(schema)
+        self._set_exists(schema["class"], True)
+        logger.info(f"Created Weaviate class: {schema['class']}")
@@ -28,6 +28,13 @@ const suggestions = [
   "Provide health tips",
 ];
 
+const escapeHtml = (text) =>
+  text.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+
+// Medical report processing runs as a background job on the server
+const REPORT_POLL_INTERVAL_MS = 1500;
+const REPORT_POLL_MAX_ATTEMPTS = 200;
+
 function ChatPage() {
   const navigate = useNavigate();
   const { user, isLoggedIn, logout } = useUser();
@@ -200,6 +207,29 @@ function ChatPage() {
     return 'File';
   };
 
+  const pollReportJob = async (jobId, token) => {
+    // Resolves with the job result ({ summary, response }) or { error }
+    for (let attempt = 0; attempt < REPORT_POLL_MAX_ATTEMPTS; attempt++) {
+      await new Promise((resolve) => setTimeout(resolve, REPORT_POLL_INTERVAL_MS));
+      const response = await fetch(`http://localhost:5000/api/jobs/${jobId}`, {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+        },
+      });
+      const job = await response.json();
+      if (!response.ok) {
+        return { error: job.error || 'Failed to check the report status.' };
+      }
+      if (job.status === 'completed') {
+        return job.result;
+      }
+      if (job.status === 'failed') {
+        return { error: job.error || 'Failed to process the file. Please try again.' };
+      }
+    }
+    return { error: 'Your report is taking longer than expected. Please try again later.' };
+  };
+
   const handleSendFile = async () => {
     if (!file) {
       setMessages((prev) => [
@@ -245,10 +275,15 @@ function ChatPage() {
         body: formData,
       });
 
-      const data = await response.json();
+      let data = await response.json();
+
+      // The report is processed in the background; poll its job until it finishes
+      if (response.ok && data.job_id) {
+        data = await pollReportJob(data.job_id, token);
+      }
       setIsTyping(false);
 
-      if (response.ok) {
+      if (response.ok && !data.error) {
         setMessages((prev) => [
           ...prev,
           {
@@ -300,7 +335,7 @@ function ChatPage() {
 
     try {
       const token = localStorage.getItem('token');
-      const response = await fetch('http://localhost:5000/api/ask', {
+      const response = await fetch('http://localhost:5000/api/ask/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -309,19 +344,9 @@ function ChatPage() {
         body: JSON.stringify({ message: input }),
       });
 
-      const data = await response.json();
-      setIsTyping(false);
-
-      if (response.ok) {
-        setMessages((prev) => [
-          ...prev,
-          {
-            type: 'assistant',
-            content: data.response,
-            timestamp: new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
-          },
-        ]);
-      } else {
+      if (!response.ok || !response.body) {
+        const data = await response.json();
+        setIsTyping(false);
         setMessages((prev) => [
           ...prev,
           {
@@ -330,7 +355,52 @@ function ChatPage() {
             timestamp: new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
           },
         ]);
+        return;
       }
+
+      // The answer streams in as server-sent events; one assistant message grows as they arrive
+      const timestamp = new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
+      const streamId = `${Date.now()}-${Math.random()}`;
+      let html = '';
+      let partialLine = '';
+      const showAssistantMessage = (content) => {
+        setMessages((prev) =>
+          prev.some((message) => message.streamId === streamId)
+            ? prev.map((message) => (message.streamId === streamId ? { ...message, content } : message))
+            : [...prev, { type: 'assistant', content, timestamp, streamId }]
+        );
+      };
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const rawEvent of events) {
+          const eventName = (rawEvent.match(/^event: (.*)$/m) || [])[1];
+          const dataLine = (rawEvent.match(/^data: (.*)$/m) || [])[1];
+          if (!eventName || !dataLine) continue;
+          const payload = JSON.parse(dataLine);
+          setIsTyping(false);
+          if (eventName === 'token') {
+            // The line still being written is shown as plain text until the server formats it
+            partialLine = (partialLine + payload.text).split('\n').pop();
+            showAssistantMessage(html + `<p>${escapeHtml(partialLine)}</p>`);
+          } else if (eventName === 'html') {
+            html += payload.html;
+            showAssistantMessage(html + (partialLine ? `<p>${escapeHtml(partialLine)}</p>` : ''));
+          } else if (eventName === 'done') {
+            showAssistantMessage(payload.response);
+          } else if (eventName === 'error') {
+            showAssistantMessage(`<p>${escapeHtml(payload.error || 'Failed to get a response. Please try again.')}</p>`);
+          }
+        }
+      }
+      setIsTyping(false);
     } catch (error) {
       setIsTyping(false);
       setMessages((prev) => [
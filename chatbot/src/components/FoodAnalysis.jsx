@@ -9,7 +9,7 @@ import { useUser } from '../context/UserContext';
 function FoodAnalysis() {
   const navigate = useNavigate();
   const { user, isLoggedIn, logout } = useUser();
-  const [image, setImage] = useState(null);
+  const [images, setImages] = useState([]);
   const [analysisResult, setAnalysisResult] = useState(null);
   const [loading, setLoading] = useState(false);
   const fileInputRef = useRef(null);
@@ -19,25 +19,27 @@ function FoodAnalysis() {
   }
 
   const handleImageUpload = async (e) => {
-    const uploadedFile = e.target.files[0];
-    if (!uploadedFile) return;
+    const uploadedFiles = Array.from(e.target.files);
+    if (uploadedFiles.length === 0) return;
 
     const validImageTypes = ['image/jpeg', 'image/png', 'image/gif'];
-    if (!validImageTypes.includes(uploadedFile.type)) {
+    if (uploadedFiles.some((uploadedFile) => !validImageTypes.includes(uploadedFile.type))) {
       setAnalysisResult({
         type: 'error',
         message: 'Please upload a valid image file (JPEG, PNG, or GIF).',
       });
-      setImage(null);
+      setImages([]);
       return;
     }
 
-    setImage(uploadedFile);
+    setImages(uploadedFiles);
     setAnalysisResult(null);
     setLoading(true);
 
+    // Several dishes go to the batch endpoint as one meal
+    const isBatch = uploadedFiles.length > 1;
     const formData = new FormData();
-    formData.append('file', uploadedFile);
+    uploadedFiles.forEach((uploadedFile) => formData.append(isBatch ? 'files' : 'file', uploadedFile));
 
     try {
       const token = localStorage.getItem('token');
@@ -45,7 +47,7 @@ function FoodAnalysis() {
         throw new Error('Authentication token missing. Please log in again.');
       }
 
-      const response = await fetch('http://localhost:5000/api/upload-image', {
+      const response = await fetch(`http://localhost:5000/api/${isBatch ? 'upload-images' : 'upload-image'}`, {
         method: 'POST',
         headers: {
           'Authorization': `Bearer ${token}`,
@@ -61,18 +63,32 @@ function FoodAnalysis() {
       const data = await response.json();
       console.log('Response data:', data); // Debug the response
 
-      // Robust parsing of message
-      const messageParts = data.message.match(/I’ve detected ([\w\s]+) with (\d+\.\d+)% confidence/);
-      const detectedFood = messageParts ? messageParts[1] : 'Unknown';
-      const confidence = messageParts ? messageParts[2] : 'N/A';
+      let detections;
+      if (isBatch) {
+        detections = data.detections.map((detection) => ({
+          food: detection.label,
+          confidence: detection.confidence.toFixed(2),
+        }));
+      } else {
+        // Robust parsing of message
+        const messageParts = data.message.match(/I’ve detected ([\w\s]+) with (\d+\.\d+)% confidence/);
+        detections = [{
+          food: messageParts ? messageParts[1] : 'Unknown',
+          confidence: messageParts ? messageParts[2] : 'N/A',
+        }];
+      }
 
       setAnalysisResult({
         type: 'success',
         message: (
           <div>
             <p><strong>Food Analysis Result:</strong></p>
-            <p>Detected food: {detectedFood}</p>
-            <p>Confidence: {confidence}%</p>
+            {detections.map((detection, index) => (
+              <div key={index}>
+                <p>Detected food: {detection.food}</p>
+                <p>Confidence: {detection.confidence}%</p>
+              </div>
+            ))}
             <div
               className="analysis-content"
               dangerouslySetInnerHTML={{ __html: data.analysis }}
@@ -92,7 +108,7 @@ function FoodAnalysis() {
   };
 
   const handleRemoveImage = () => {
-    setImage(null);
+    setImages([]);
     setAnalysisResult(null);
     setLoading(false);
     if (fileInputRef.current) {
@@ -186,7 +202,7 @@ function FoodAnalysis() {
       <div className="container flex-grow-1 d-flex flex-column py-3">
         <h1 className="text-center mb-4">Food Analysis</h1>
         <p className="text-center text-muted mb-4">
-          Upload an image of your food to analyze its nutritional content.
+          Upload an image of your food to analyze its nutritional content, or select several dishes to analyze a whole meal.
         </p>
 
         <div className="d-flex flex-column align-items-center mb-4">
@@ -195,25 +211,29 @@ function FoodAnalysis() {
             ref={fileInputRef}
             style={{ display: 'none' }}
             accept="image/jpeg,image/png,image/gif"
+            multiple
             onChange={handleImageUpload}
           />
-          {!image ? (
+          {images.length === 0 ? (
             <button
               className="btn btn-primary d-flex align-items-center gap-2"
               onClick={handleUploadClick}
               disabled={loading}
             >
               <Upload size={20} />
-              {loading ? 'Analyzing...' : 'Upload Food Image'}
+              {loading ? 'Analyzing...' : 'Upload Food Images'}
             </button>
           ) : (
-            <div className="position-relative">
-              <img
-                src={URL.createObjectURL(image)}
-                alt="Uploaded Food"
-                className="rounded-3 shadow-sm mb-3"
-                style={{ maxWidth: '100%', maxHeight: '300px', objectFit: 'contain' }}
-              />
+            <div className="position-relative d-flex flex-wrap justify-content-center gap-2">
+              {images.map((image, index) => (
+                <img
+                  key={index}
+                  src={URL.createObjectURL(image)}
+                  alt="Uploaded Food"
+                  className="rounded-3 shadow-sm mb-3"
+                  style={{ maxWidth: images.length > 1 ? '200px' : '100%', maxHeight: '300px', objectFit: 'contain' }}
+                />
+              ))}
               <button
                 className="btn btn-danger btn-sm position-absolute top-0 end-0"
                 onClick={handleRemoveImage}